@@ -1,4 +1,14 @@
+import json
 import unicodedata
+from bisect import bisect_left, bisect_right
+from collections import deque
+from heapq import heappush, heapreplace, merge
+from time import perf_counter
+
+import numpy as np
+
+from dados import SEM_TRIBUNAL, codificar_tribunais, coluna_codigo, normalizar_tribunal, possui_codigos
+from instrumentacao import contar, etapa, medindo
 
 def normalizar_texto(texto):
     if not isinstance(texto, str):
@@ -8,287 +18,819 @@ def normalizar_texto(texto):
     return texto_sem_acento.strip().lower()
 
 
-def buscar_permutas_diretas(df, origem_user, destino_user):
+COLUNAS_DESTINO = ["Destino 1", "Destino 2", "Destino 3"]
+LETRAS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+class IndicePermutas:
     """
-    MANTENDO A LÓGICA ORIGINAL QUE FUNCIONA
-    Busca permutas diretas entre origem_user e destino_user
+    Índice da planilha construído uma única vez para a busca de combinações.
+    - por_origem: código do tribunal -> posições dos juízes lotados nele
+    - destinos: posição do juiz -> códigos dos tribunais desejados
+    - chaves: posição do juiz -> rótulo da linha no DataFrame (estável no snapshot local)
+    A busca percorre apenas as arestas reais "A quer ir para onde B está".
+    Com `regra_entrancia` (ver regra_entrancia), o índice é particionado por
+    (tribunal, entrância): a origem de cada juiz passa a ser o par e cada destino
+    vira os pares com as entrâncias que ele aceita. As arestas incompatíveis deixam
+    de existir, e todas as buscas as podam já no primeiro passo, sem mudar nada nelas.
+    Os juízes ficam em listas paralelas (uma posição por juiz) e os ciclos circulam
+    como tuplas de posições; dicionários de exibição só são montados para exibir.
     """
-    casais = []
-
-    # Normalizar entrada do usuário
-    origem_user = normalizar_texto(origem_user)
-    destino_user = normalizar_texto(destino_user)
 
-    for i, linha_a in df.iterrows():
-        origem_a = normalizar_texto(linha_a.get("Origem"))
-        entrancia_a = linha_a.get("Entrância")
-        destinos_a = [
-            normalizar_texto(linha_a.get("Destino 1")),
-            normalizar_texto(linha_a.get("Destino 2")),
-            normalizar_texto(linha_a.get("Destino 3"))
+    __slots__ = (
+        "codigos_tribunais", "aliases_tribunais", "chaves", "nomes", "entrancias", "origens_exibicao",
+        "origens", "destinos", "prioridades", "por_origem", "por_destino", "_distancias", "_nomes",
+        "regra_entrancia", "faixa", "vertices",
+    )
+
+    def __init__(self, df, regra_entrancia=None):
+        if not possui_codigos(df):
+            df = codificar_tribunais(df)
+        self.codigos_tribunais = df.attrs["codigos_tribunais"]
+        self.aliases_tribunais = df.attrs["aliases_tribunais"]
+
+        def coluna(nome):
+            if nome in df.columns:
+                return df[nome].tolist()
+            return [None] * len(df)
+
+        self.chaves = df.index.tolist()
+        self.nomes = coluna("Nome")
+        self.entrancias = coluna("Entrância")
+        self.origens_exibicao = coluna("Origem")
+
+        self.origens = df[coluna_codigo("Origem")].tolist()
+        colunas_destino = [coluna_codigo(c) for c in COLUNAS_DESTINO if c in df.columns]
+        linhas_destino = zip(*(df[c].tolist() for c in colunas_destino)) if colunas_destino else [()] * len(df)
+        # Destinos e prioridades em tuplas paralelas, compartilhadas entre juízes com o mesmo pedido
+        compartilhadas = {}
+        self.destinos = []
+        self.prioridades = []
+        for destinos_linha in linhas_destino:
+            prioridades = {}
+            for prioridade, destino in enumerate(destinos_linha, 1):
+                if destino != SEM_TRIBUNAL:
+                    prioridades.setdefault(destino, prioridade)
+            destinos = compartilhadas.setdefault(tuple(prioridades), tuple(prioridades))
+            self.destinos.append(destinos)
+            self.prioridades.append(compartilhadas.setdefault(tuple(prioridades.values()), tuple(prioridades.values())))
+
+        # Códigos de vértice: tribunal + faixa * grupo de entrância (sem regra, só o tribunal)
+        self.regra_entrancia = regra_entrancia
+        self.faixa = max(1, len(self.codigos_tribunais))
+        self.vertices = self.faixa
+        if regra_entrancia is not None:
+            self._particionar(regra_entrancia)
+
+        self.por_origem = {}
+        for posicao, origem in enumerate(self.origens):
+            if origem != SEM_TRIBUNAL:
+                self.por_origem.setdefault(origem, []).append(posicao)
+
+        self.por_destino = {}
+        for posicao, destinos in enumerate(self.destinos):
+            for destino in destinos:
+                self.por_destino.setdefault(destino, []).append(posicao)
+
+        self._distancias = {}
+        self._nomes = None
+
+    def __len__(self):
+        return len(self.origens)
+
+    def _particionar(self, regra):
+        grupos, aceitas = grupos_entrancia(self.entrancias, regra)
+        faixa = self.faixa
+        self.vertices = faixa * max(1, len(aceitas))
+        self.origens = [
+            origem if origem == SEM_TRIBUNAL else origem + faixa * grupo
+            for origem, grupo in zip(self.origens, grupos)
         ]
-        destinos_a = [d for d in destinos_a if d]
-
-        for j, linha_b in df.iterrows():
-            if i == j:
+        compartilhadas = {}
+        for posicao, grupo in enumerate(grupos):
+            destinos = tuple(d + faixa * g for d in self.destinos[posicao] for g in aceitas[grupo])
+            prioridades = tuple(p for p in self.prioridades[posicao] for _ in aceitas[grupo])
+            self.destinos[posicao] = compartilhadas.setdefault(destinos, destinos)
+            self.prioridades[posicao] = compartilhadas.setdefault(prioridades, prioridades)
+
+    def tribunal(self, posicao):
+        """Código do tribunal de origem do juiz (sem a entrância, mesmo com o índice particionado)"""
+        origem = self.origens[posicao]
+        return origem if origem == SEM_TRIBUNAL else origem % self.faixa
+
+    def compacto(self):
+        """
+        Cópia só com o grafo (códigos, destinos, prioridades e índices por tribunal),
+        sem os campos de exibição: é o que vale a pena enviar a outros processos.
+        """
+        copia = object.__new__(IndicePermutas)
+        for campo in self.__slots__:
+            setattr(copia, campo, getattr(self, campo))
+        copia.chaves = copia.nomes = copia.entrancias = copia.origens_exibicao = None
+        copia._distancias = {}
+        copia._nomes = None
+        return copia
+
+    def nomes_indexados(self):
+        """Índice de nomes dos juízes (IndiceNomes), montado na primeira consulta"""
+        if self._nomes is None:
+            self._nomes = IndiceNomes(self.chaves, self.nomes)
+        return self._nomes
+
+    def codigo(self, tribunal):
+        """Código de um tribunal digitado pelo usuário (SEM_TRIBUNAL se vazio ou desconhecido)"""
+        chave = normalizar_tribunal(tribunal, self.aliases_tribunais)
+        return self.codigos_tribunais.get(chave, SEM_TRIBUNAL)
+
+    def sucessores(self, posicao, acima_de=-1):
+        """Juízes lotados em algum destino desejado, na ordem da planilha (só posições > acima_de)"""
+        listas = [self.por_origem[d] for d in self.destinos[posicao] if d in self.por_origem]
+        if acima_de >= 0:
+            listas = [lista[bisect_right(lista, acima_de):] for lista in listas]
+        if len(listas) == 1:
+            return listas[0]
+        return merge(*listas)
+
+    def prioridade(self, atual, proximo):
+        """1, 2 ou 3: em qual Destino o juiz `atual` pediu a origem de `proximo`"""
+        try:
+            return self.prioridades[atual][self.destinos[atual].index(self.origens[proximo])]
+        except ValueError:
+            return None
+
+    def fecha_ciclo(self, ultimo, primeiro):
+        return self.origens[primeiro] in self.destinos[ultimo]
+
+    def distancias_ate(self, origem):
+        """
+        Para cada tribunal, o mínimo de movimentos para que alguém lotado nele chegue,
+        de juiz em juiz, a quem quer ir para `origem` (BFS no grafo de tribunais, em cache).
+        """
+        if origem not in self._distancias:
+            distancias = {}
+            fila = deque()
+            for posicao in self.por_destino.get(origem, ()):
+                tribunal = self.origens[posicao]
+                if tribunal not in distancias:
+                    distancias[tribunal] = 1
+                    fila.append(tribunal)
+            while fila:
+                tribunal = fila.popleft()
+                for posicao in self.por_destino.get(tribunal, ()):
+                    anterior = self.origens[posicao]
+                    if anterior not in distancias:
+                        distancias[anterior] = distancias[tribunal] + 1
+                        fila.append(anterior)
+            self._distancias[origem] = distancias
+        return self._distancias[origem]
+
+    def movimentos_para_fechar(self, posicao, origem):
+        """Limite inferior de movimentos para o juiz em `posicao` fechar um ciclo em `origem`"""
+        destinos = self.destinos[posicao]
+        if origem in destinos:
+            return 1
+        distancias = self.distancias_ate(origem)
+        return 1 + min((distancias[d] for d in destinos if d in distancias), default=len(self))
+
+    def fechamentos(self, raiz):
+        """Juízes que querem ir para onde `raiz` está, agrupados pela própria origem"""
+        por_origem = {}
+        for posicao in self.por_destino.get(self.origens[raiz], ()):
+            por_origem.setdefault(self.origens[posicao], []).append(posicao)
+        return por_origem
+
+
+# Regras de compatibilidade de entrância
+def regra_entrancia(texto):
+    """
+    Regra a partir do texto de configuração (ex.: PERMUTA_ENTRANCIA):
+    vazio -> None (sem regra); "mesma" -> só a mesma entrância;
+    JSON {"Inicial": ["Inicial", "Intermediária"], ...} -> matriz de compatibilidade.
+    """
+    texto = (texto or "").strip()
+    if not texto:
+        return None
+    if normalizar_texto(texto) == "mesma":
+        return "mesma"
+    try:
+        matriz = json.loads(texto)
+    except ValueError:
+        raise ValueError(f"Regra de entrância inválida: {texto!r} (use 'mesma' ou uma matriz JSON)")
+    return _validar_matriz(matriz)
+
+
+def _validar_matriz(matriz):
+    if not isinstance(matriz, dict):
+        raise ValueError("A matriz de entrâncias deve ser um objeto JSON: entrância -> entrâncias aceitas")
+    for entrancia, aceitas in matriz.items():
+        if not isinstance(aceitas, list) or not all(isinstance(aceita, str) for aceita in aceitas):
+            raise ValueError(f"Entrâncias aceitas por {entrancia!r} devem ser uma lista de textos: {aceitas!r}")
+    return matriz
+
+
+def chave_regra_entrancia(regra):
+    """Forma estável e hashable da regra, para caches"""
+    if regra is None or isinstance(regra, str):
+        return regra
+    return tuple(sorted(
+        (normalizar_texto(entrancia), tuple(sorted({normalizar_texto(a) for a in aceitas})))
+        for entrancia, aceitas in regra.items()
+    ))
+
+
+def grupos_entrancia(entrancias, regra):
+    """
+    (grupo de cada juiz, grupo -> grupos aceitos) para uma regra de entrância.
+    Um juiz do grupo g pode ocupar a vaga de um juiz do grupo h se h está em aceitas[g]:
+    quem se move assume a entrância da vaga de quem sai.
+    Entrâncias são comparadas sem acento nem caixa; uma entrância ausente da matriz
+    (ou vazia) só aceita a própria.
+    """
+    normalizadas = [normalizar_texto(entrancia) for entrancia in entrancias]
+    codigos = {nome: grupo for grupo, nome in enumerate(sorted(set(normalizadas)))}
+    grupos = [codigos[nome] for nome in normalizadas]
+
+    if regra == "mesma":
+        return grupos, [(grupo,) for grupo in range(len(codigos))]
+    if not isinstance(regra, dict):
+        raise ValueError(f"Regra de entrância desconhecida: {regra!r}")
+    _validar_matriz(regra)
+    matriz = {normalizar_texto(e): {normalizar_texto(a) for a in aceitas} for e, aceitas in regra.items()}
+    aceitas = []
+    for nome, grupo in codigos.items():
+        if nome in matriz:
+            aceitas.append(tuple(sorted(codigos[a] for a in matriz[nome] if a in codigos)))
+        else:
+            aceitas.append((grupo,))
+    return grupos, aceitas
+
+
+def chave_canonica(ciclo):
+    """Rotação do ciclo que começa pelo menor id: a mesma para A→B→C, B→C→A e C→A→B"""
+    inicio = ciclo.index(min(ciclo))
+    return tuple(ciclo[inicio:]) + tuple(ciclo[:inicio])
+
+
+class Orcamento:
+    """Limites de uma busca: tempo de relógio (segundos) e número de ciclos"""
+
+    __slots__ = ("prazo", "limite_resultados", "encontrados", "esgotado", "passos")
+
+    def __init__(self, tempo_limite=None, limite_resultados=None):
+        self.prazo = perf_counter() + tempo_limite if tempo_limite is not None else None
+        self.limite_resultados = limite_resultados
+        self.encontrados = 0
+        self.esgotado = False
+        self.passos = 0
+
+    def expandir(self):
+        """Chamado a cada aresta percorrida; devolve False quando a busca deve parar"""
+        self.passos += 1
+        if self.prazo is not None and self.passos % 1024 == 0 and perf_counter() > self.prazo:
+            self.esgotado = True
+        return not self.esgotado
+
+    def registrar(self):
+        self.encontrados += 1
+        if self.limite_resultados is not None and self.encontrados >= self.limite_resultados:
+            self.esgotado = True
+
+
+def enumerar_ciclos(indice, tamanhos, orcamento=None, limite=None, inicios=None):
+    """
+    Gera, em uma única travessia, tuplas de posições (A, B, ...) que formam ciclos
+    com algum dos `tamanhos` pedidos, à medida que são encontrados.
+    Cada ciclo sai uma única vez, já na forma canônica: A é o menor id e os demais
+    participantes são buscados apenas entre ids maiores que o dele.
+    Ramos que não conseguem voltar a A dentro do maior tamanho são podados, assim
+    como (se `limite` for dado) os que não podem terminar com soma de prioridades
+    <= limite(tamanho_minimo), onde tamanho_minimo é o menor ciclo que o ramo ainda
+    pode formar; `limite` é consultado a cada passo e pode diminuir durante a busca.
+    Com `inicios`, só os ciclos cujo menor id está entre eles (partição do trabalho).
+    """
+    tamanhos = set(tamanhos)
+    if not tamanhos:
+        return
+    if inicios is None:
+        inicios = range(len(indice))
+    maximo = max(tamanhos)
+    caminho = []
+
+    def estender(origem, custo):
+        atual = caminho[-1]
+        if len(caminho) in tamanhos and len(caminho) > 1 and indice.fecha_ciclo(atual, caminho[0]):
+            yield tuple(caminho)
+        if len(caminho) >= maximo:
+            return
+        # Estender custa ao menos mais duas arestas (até o próximo e de volta ao início)
+        if limite is not None and custo + 2 > limite(len(caminho) + 1):
+            return
+        for proximo in indice.sucessores(atual, acima_de=caminho[0]):
+            if orcamento is not None and not orcamento.expandir():
+                return
+            if proximo in caminho:
+                continue
+            passos = indice.movimentos_para_fechar(proximo, origem)
+            if len(caminho) + passos > maximo:
                 continue
+            custo_proximo = custo + indice.prioridade(atual, proximo) if limite is not None else 0
+            if limite is not None and custo_proximo + passos > limite(len(caminho) + passos):
+                continue
+            caminho.append(proximo)
+            yield from estender(origem, custo_proximo)
+            caminho.pop()
+
+    for inicio in inicios:
+        if orcamento is not None and orcamento.esgotado:
+            return
+        caminho.append(inicio)
+        yield from estender(indice.origens[inicio], 0)
+        caminho.pop()
 
-            origem_b = normalizar_texto(linha_b.get("Origem"))
-            entrancia_b = linha_b.get("Entrância")
-            destinos_b = [
-                normalizar_texto(linha_b.get("Destino 1")),
-                normalizar_texto(linha_b.get("Destino 2")),
-                normalizar_texto(linha_b.get("Destino 3"))
-            ]
-            destinos_b = [d for d in destinos_b if d]
 
-            if origem_b in destinos_a and origem_a in destinos_b:
-                casal = {
-                    "Juiz A": linha_a.get("Nome"),
-                    "Entrância A": entrancia_a,
-                    "Origem A": linha_a.get("Origem"),
-                    "Destino A": linha_b.get("Origem"),
+def enumerar_ciclos_do_juiz(indice, raiz, tamanhos, orcamento=None, limite=None):
+    """
+    Gera, em uma única travessia, os ciclos que contêm `raiz` (começando por ela)
+    para todos os `tamanhos` pedidos; a busca não se aprofunda além do maior deles.
+    `orcamento` e `limite` funcionam como em enumerar_ciclos.
+    A ida parte da raiz pelas arestas de saída; o último participante vem do índice
+    inverso (quem quer ir para a origem da raiz), e as duas pontas se encontram no meio.
+    Cada ciclo sai uma única vez: só existe uma rotação que começa pela raiz.
+    """
+    tamanhos = set(tamanhos)
+    fechamentos = indice.fechamentos(raiz)
+    if not tamanhos or not fechamentos:
+        return
+    maximo = max(tamanhos)
+    origem = indice.origens[raiz]
+    caminho = [raiz]
+
+    def estender(custo):
+        atual = caminho[-1]
+        if len(caminho) + 1 in tamanhos:
+            for destino in indice.destinos[atual]:
+                for ultimo in fechamentos.get(destino, ()):
+                    if ultimo not in caminho:
+                        yield (*caminho, ultimo)
+        if len(caminho) + 1 >= maximo:
+            return
+        # Estender gera ciclos com ao menos len(caminho) + 2 juízes e mais duas arestas
+        if limite is not None and custo + 2 > limite(len(caminho) + 2):
+            return
+        for proximo in indice.sucessores(atual):
+            if orcamento is not None and not orcamento.expandir():
+                return
+            if proximo in caminho:
+                continue
+            passos = indice.movimentos_para_fechar(proximo, origem)
+            if len(caminho) + passos > maximo:
+                continue
+            custo_proximo = custo + indice.prioridade(atual, proximo) if limite is not None else 0
+            # Os ciclos em que `proximo` fecha direto na raiz já saíram pelos fechamentos acima
+            if limite is not None and custo_proximo + passos > limite(len(caminho) + max(passos, 2)):
+                continue
+            caminho.append(proximo)
+            yield from estender(custo_proximo)
+            caminho.pop()
+
+    yield from estender(0)
+
+
+def _envolve_usuario(indice, ciclo, origem_user, destino_user):
+    """Algum participante sai de origem_user para o tribunal destino_user"""
+    for posicao, atual in enumerate(ciclo):
+        proximo = ciclo[(posicao + 1) % len(ciclo)]
+        if indice.tribunal(atual) == origem_user and indice.tribunal(proximo) == destino_user:
+            return True
+    return False
+
+
+def montar_ciclo(indice, ciclo):
+    resultado = {}
+    for posicao, atual in enumerate(ciclo):
+        letra = LETRAS[posicao]
+        proximo = ciclo[(posicao + 1) % len(ciclo)]
+        resultado[f"Juiz {letra}"] = indice.nomes[atual]
+        resultado[f"Entrância {letra}"] = indice.entrancias[atual]
+        resultado[f"Origem {letra}"] = indice.origens_exibicao[atual]
+        resultado[f"{letra} ➝"] = indice.origens_exibicao[proximo]
+        resultado[f"Prioridade {letra}"] = indice.prioridade(atual, proximo)
+    return resultado
+
+
+def montar_casal(indice, ciclo):
+    a, b = ciclo
+    return {
+        "Juiz A": indice.nomes[a],
+        "Entrância A": indice.entrancias[a],
+        "Origem A": indice.origens_exibicao[a],
+        "Destino A": indice.origens_exibicao[b],
+        "Prioridade A": indice.prioridade(a, b),
+
+        "Juiz B": indice.nomes[b],
+        "Entrância B": indice.entrancias[b],
+        "Origem B": indice.origens_exibicao[b],
+        "Destino B": indice.origens_exibicao[a],
+        "Prioridade B": indice.prioridade(b, a)
+    }
+
+
+def _matriz_desejos(indice):
+    """
+    Matriz booleana juiz x tribunal: desejos[j, t] diz se o juiz j quer o tribunal t.
+    A última coluna representa "sem tribunal" e é sempre falsa, de modo que
+    W[i, j] ("i quer ir para onde j está") é desejos[i, colunas[j]].
+    Com o índice particionado por entrância, as colunas são os pares (tribunal, entrância).
+    """
+    colunas = np.array(indice.origens, dtype=np.int64)
+    sem_tribunal = indice.vertices
+    colunas[colunas == SEM_TRIBUNAL] = sem_tribunal
+    desejos = np.zeros((len(indice), sem_tribunal + 1), dtype=bool)
+    for juiz, destinos in enumerate(indice.destinos):
+        desejos[juiz, list(destinos)] = True
+    return desejos, colunas
+
 
-                    "Juiz B": linha_b.get("Nome"),
-                    "Entrância B": entrancia_b,
-                    "Origem B": linha_b.get("Origem"),
-                    "Destino B": linha_a.get("Origem")
-                }
+def _enumerar_ciclos_matriciais(indice, tamanho):
+    """
+    Backend vetorizado (NumPy) para casais e triangulações, na mesma forma canônica e
+    na mesma ordem de enumerar_ciclos.
+    - Casais: W ∧ Wᵀ acima da diagonal, sem nenhum laço em Python.
+    - Triangulações: para cada A, os candidatos B (linha de W, ids > A) e C (coluna de
+      W, ids > A) formam o bloco W[B, C], cujas posições verdadeiras fecham o ciclo.
+    W nunca é materializada para as triangulações: cada bloco sai da matriz juiz x tribunal.
+    """
+    if tamanho not in (2, 3):
+        raise ValueError("O backend numpy cobre apenas casais (2) e triangulações (3)")
+    desejos, colunas = _matriz_desejos(indice)
+
+    if tamanho == 2:
+        desejo = desejos[:, colunas]
+        pares = np.triu(desejo & desejo.T, 1)
+        for a, b in zip(*np.nonzero(pares)):
+            yield (int(a), int(b))
+        return
+
+    for a in range(len(indice)):
+        linha = desejos[a, colunas]
+        linha[:a + 1] = False
+        candidatos_b = np.flatnonzero(linha)
+        if not len(candidatos_b):
+            continue
+        coluna = desejos[:, colunas[a]].copy()
+        coluna[:a + 1] = False
+        candidatos_c = np.flatnonzero(coluna)
+        if not len(candidatos_c):
+            continue
+        bloco = desejos[np.ix_(candidatos_b, colunas[candidatos_c])]
+        bloco &= candidatos_b[:, None] != candidatos_c[None, :]
+        for b, c in zip(*np.nonzero(bloco)):
+            yield (a, int(candidatos_b[b]), int(candidatos_c[c]))
+
+
+def _buscar(df, origem_user, destino_user, tamanho, montar, indice=None, backend="python"):
+    if backend not in ("python", "numpy"):
+        raise ValueError(f"Backend desconhecido: {backend}")
+    if indice is None:
+        indice = IndicePermutas(df)
+
+    filtrar = bool(normalizar_texto(origem_user) and normalizar_texto(destino_user))
+    origem_user = indice.codigo(origem_user)
+    destino_user = indice.codigo(destino_user)
+    if filtrar and SEM_TRIBUNAL in (origem_user, destino_user):
+        return []
+
+    with etapa(f"busca_{tamanho}_{backend}"):
+        orcamento = Orcamento() if medindo() and backend == "python" else None
+        if backend == "numpy":
+            enumerados = _enumerar_ciclos_matriciais(indice, tamanho)
+        else:
+            enumerados = enumerar_ciclos(indice, {tamanho}, orcamento)
+
+        resultados = []
+        for ciclo in enumerados:
+            if filtrar and not _envolve_usuario(indice, ciclo, origem_user, destino_user):
+                continue
+            resultados.append(montar(indice, ciclo))
 
-                if origem_user and destino_user:
-                    if not (
-                        (origem_a == origem_user and origem_b == destino_user) or
-                        (origem_b == origem_user and origem_a == destino_user)
-                    ):
-                        continue
+        contar("ciclos_encontrados", len(resultados))
+        if orcamento is not None:
+            contar("arestas_percorridas", orcamento.passos)
+    return resultados
 
-                casais.append(casal)
 
-    return casais
+def buscar_permutas_diretas(df, origem_user, destino_user, indice=None, backend="python"):
+    """
+    Busca permutas diretas entre origem_user e destino_user
+    backend="numpy" usa o cálculo matricial vetorizado (mesmo resultado)
+    """
+    return _buscar(df, origem_user, destino_user, 2, montar_casal, indice, backend)
 
 
-def buscar_triangulacoes(df, origem_user, destino_user):
+def buscar_triangulacoes(df, origem_user, destino_user, indice=None, backend="python"):
     """
-    MANTENDO A LÓGICA ORIGINAL QUE FUNCIONA
     Busca triangulações envolvendo origem_user e destino_user
+    backend="numpy" usa o cálculo matricial vetorizado (mesmo resultado)
     """
-    triangulos = []
+    return _buscar(df, origem_user, destino_user, 3, montar_ciclo, indice, backend)
 
-    origem_user = normalizar_texto(origem_user)
-    destino_user = normalizar_texto(destino_user)
 
-    for i, linha_a in df.iterrows():
-        origem_a = normalizar_texto(linha_a.get("Origem"))
-        entrancia_a = linha_a.get("Entrância")
-        destinos_a = [
-            normalizar_texto(linha_a.get("Destino 1")),
-            normalizar_texto(linha_a.get("Destino 2")),
-            normalizar_texto(linha_a.get("Destino 3"))
-        ]
-        destinos_a = [d for d in destinos_a if d]
+def buscar_quadrangulacoes(df, origem_user, destino_user, indice=None):
+    """
+    Busca quadrangulações envolvendo origem_user e destino_user
+    """
+    return _buscar(df, origem_user, destino_user, 4, montar_ciclo, indice)
 
-        for j, linha_b in df.iterrows():
-            if i == j:
-                continue
 
-            origem_b = normalizar_texto(linha_b.get("Origem"))
-            entrancia_b = linha_b.get("Entrância")
-            destinos_b = [
-                normalizar_texto(linha_b.get("Destino 1")),
-                normalizar_texto(linha_b.get("Destino 2")),
-                normalizar_texto(linha_b.get("Destino 3"))
-            ]
-            destinos_b = [d for d in destinos_b if d]
+def buscar_ciclos(df, max_len=4, min_len=2, raiz=None, tempo_limite=None, limite_resultados=None, indice=None,
+                  montar=True):
+    """
+    Busca ciclos de troca com min_len até max_len juízes (2 = casal, 3 = triangulação,
+    4 = quadrangulação, 5, 6, ...), em uma única travessia podada do índice.
+    Com `raiz` (posição do juiz no DataFrame), apenas os ciclos que passam por ele.
+    A busca para ao esgotar `tempo_limite` (segundos) ou `limite_resultados`;
+    nesse caso "completo" vem False e as contagens refletem o que foi encontrado.
+    Com montar=False, os ciclos vêm como tuplas de posições (bem mais leves).
+    """
+    if min_len < 2 or max_len < min_len:
+        raise ValueError("É preciso 2 <= min_len <= max_len")
+    if indice is None:
+        indice = IndicePermutas(df)
+
+    inicio = perf_counter()
+    orcamento = Orcamento(tempo_limite, limite_resultados)
+    tamanhos = set(range(min_len, max_len + 1))
+    if raiz is None:
+        enumerados = enumerar_ciclos(indice, tamanhos, orcamento)
+    else:
+        enumerados = enumerar_ciclos_do_juiz(indice, raiz, tamanhos, orcamento)
+
+    ciclos = {tamanho: [] for tamanho in sorted(tamanhos)}
+    with etapa("busca_ciclos"):
+        for ciclo in enumerados:
+            ciclos[len(ciclo)].append(montar_ciclo(indice, ciclo) if montar else ciclo)
+            orcamento.registrar()
+            if orcamento.esgotado:
+                break
+        contar("arestas_percorridas", orcamento.passos)
+        contar("ciclos_encontrados", orcamento.encontrados)
+
+    return {
+        "ciclos": ciclos,
+        "contagens": {tamanho: len(lista) for tamanho, lista in ciclos.items()},
+        "completo": not orcamento.esgotado,
+        "tempo": perf_counter() - inicio,
+    }
+
+
+def custo_ciclo(indice, ciclo):
+    """Soma das prioridades (1 a 3) dos destinos obtidos no ciclo: quanto menor, melhor"""
+    return sum(indice.prioridade(atual, ciclo[(posicao + 1) % len(ciclo)]) for posicao, atual in enumerate(ciclo))
+
+
+def _melhores(indice, k, tamanhos, raiz=None, orcamento=None, por_tamanho=False):
+    """
+    Os k ciclos de menor soma de prioridades, sem materializar os demais: um heap
+    guarda os k melhores e, quando cheio, a busca poda os ramos que já não podem
+    vencer o pior deles (branch-and-bound).
+    Com por_tamanho=True, os k melhores de cada tamanho, na mesma travessia (um heap
+    por tamanho), em {tamanho: [...]}; cada ramo é podado pelo maior dos limites dos
+    tamanhos que ele ainda pode formar.
+    """
+    tamanhos = sorted(set(tamanhos))
+    heaps = {tamanho: [] for tamanho in tamanhos} if por_tamanho else {None: []}
+    if k <= 0:
+        return {tamanho: [] for tamanho in tamanhos} if por_tamanho else []
+
+    def pior(heap):
+        return -heap[0][0] - 1 if len(heap) >= k else float("inf")
+
+    # teto[m]: maior custo ainda aceito para um ciclo com pelo menos m juízes,
+    # recalculado só quando algum heap muda (a busca o consulta a cada aresta)
+    teto = [float("inf")] * (max(tamanhos, default=0) + 1)
+
+    def atualizar_teto():
+        acumulado = -1
+        for minimo in range(len(teto) - 1, -1, -1):
+            heap = heaps.get(minimo if por_tamanho else None)
+            if heap is not None:
+                acumulado = max(acumulado, pior(heap))
+            teto[minimo] = acumulado
+
+    limite = teto.__getitem__
+
+    if raiz is None:
+        enumerados = enumerar_ciclos(indice, tamanhos, orcamento, limite=limite)
+    else:
+        enumerados = enumerar_ciclos_do_juiz(indice, raiz, tamanhos, orcamento, limite=limite)
+
+    for ordem, ciclo in enumerate(enumerados):
+        heap = heaps[len(ciclo) if por_tamanho else None]
+        custo = custo_ciclo(indice, ciclo)
+        if len(heap) < k:
+            heappush(heap, (-custo, -ordem, ciclo))
+        elif custo < -heap[0][0]:
+            heapreplace(heap, (-custo, -ordem, ciclo))
+        else:
+            continue
+        if len(heap) >= k:
+            atualizar_teto()
+
+    def em_ordem(heap):
+        return [ciclo for _, _, ciclo in sorted(heap, key=lambda item: (-item[0], -item[1]))]
+
+    if por_tamanho:
+        return {tamanho: em_ordem(heap) for tamanho, heap in heaps.items()}
+    return em_ordem(heaps[None])
+
+
+def iterar_ciclos(df, max_len=4, min_len=2, raiz=None, indice=None):
+    """Versão preguiçosa de buscar_ciclos: gera cada ciclo (dicionário) assim que é encontrado"""
+    if indice is None:
+        indice = IndicePermutas(df)
+    tamanhos = range(min_len, max_len + 1)
+    if raiz is None:
+        enumerados = enumerar_ciclos(indice, tamanhos)
+    else:
+        enumerados = enumerar_ciclos_do_juiz(indice, raiz, tamanhos)
+    for ciclo in enumerados:
+        yield montar_ciclo(indice, ciclo)
+
+
+def melhores_ciclos(df, k=50, max_len=4, min_len=2, raiz=None, indice=None):
+    """
+    Os k ciclos com a menor soma de prioridades de destino (1 = Destino 1), em ordem;
+    cada dicionário traz a soma em "Soma das Prioridades".
+    """
+    if indice is None:
+        indice = IndicePermutas(df)
+    resultado = []
+    for ciclo in _melhores(indice, k, range(min_len, max_len + 1), raiz):
+        montado = montar_ciclo(indice, ciclo)
+        montado["Soma das Prioridades"] = custo_ciclo(indice, ciclo)
+        resultado.append(montado)
+    return resultado
 
-            if origem_b not in destinos_a:
-                continue
 
-            for k, linha_c in df.iterrows():
-                if k in [i, j]:
-                    continue
-
-                origem_c = normalizar_texto(linha_c.get("Origem"))
-                entrancia_c = linha_c.get("Entrância")
-                destinos_c = [
-                    normalizar_texto(linha_c.get("Destino 1")),
-                    normalizar_texto(linha_c.get("Destino 2")),
-                    normalizar_texto(linha_c.get("Destino 3"))
-                ]
-                destinos_c = [d for d in destinos_c if d]
-
-                if origem_c not in destinos_b:
-                    continue
-
-                if origem_a in destinos_c:
-                    triangulo = {
-                        "Juiz A": linha_a.get("Nome"),
-                        "Entrância A": entrancia_a,
-                        "Origem A": linha_a.get("Origem"),
-                        "A ➝": linha_b.get("Origem"),
-
-                        "Juiz B": linha_b.get("Nome"),
-                        "Entrância B": entrancia_b,
-                        "Origem B": linha_b.get("Origem"),
-                        "B ➝": linha_c.get("Origem"),
-
-                        "Juiz C": linha_c.get("Nome"),
-                        "Entrância C": entrancia_c,
-                        "Origem C": linha_c.get("Origem"),
-                        "C ➝": linha_a.get("Origem")
-                    }
-
-                    if origem_user and destino_user:
-                        if not (
-                            (origem_a == origem_user and origem_b == destino_user) or
-                            (origem_b == origem_user and origem_c == destino_user) or
-                            (origem_c == origem_user and origem_a == destino_user)
-                        ):
-                            continue
-
-                    triangulos.append(triangulo)
-
-    return triangulos
-
-
-def buscar_quadrangulacoes(df, origem_user, destino_user):
-    """
-    NOVA FUNÇÃO: Busca quadrangulações baseada na lógica funcionante
-    """
-    quadrangulos = []
-
-    origem_user = normalizar_texto(origem_user)
-    destino_user = normalizar_texto(destino_user)
-
-    for i, linha_a in df.iterrows():
-        origem_a = normalizar_texto(linha_a.get("Origem"))
-        entrancia_a = linha_a.get("Entrância")
-        destinos_a = [
-            normalizar_texto(linha_a.get("Destino 1")),
-            normalizar_texto(linha_a.get("Destino 2")),
-            normalizar_texto(linha_a.get("Destino 3"))
-        ]
-        destinos_a = [d for d in destinos_a if d]
+# FUNÇÕES AUXILIARES PARA BUSCA POR NOME
+def normalizar_nome(nome):
+    """Nome sem acentos, em minúsculas e com espaços simples"""
+    return " ".join(normalizar_texto(nome).split())
 
-        for j, linha_b in df.iterrows():
-            if i == j:
-                continue
 
-            origem_b = normalizar_texto(linha_b.get("Origem"))
-            entrancia_b = linha_b.get("Entrância")
-            destinos_b = [
-                normalizar_texto(linha_b.get("Destino 1")),
-                normalizar_texto(linha_b.get("Destino 2")),
-                normalizar_texto(linha_b.get("Destino 3"))
-            ]
-            destinos_b = [d for d in destinos_b if d]
+def _trigramas(texto):
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
 
-            if origem_b not in destinos_a:
+
+class IndiceNomes:
+    """
+    Identidade dos juízes para a busca por nome, sem varrer a planilha:
+    - por_chave: chave da linha (o valor escolhido no selectbox) -> posição, O(1)
+    - por_nome: nome normalizado -> posições (homônimos ficam juntos), O(1)
+    - ordenados: nomes normalizados em ordem, para busca por prefixo com bisect, O(log n)
+    - trigramas: trigrama -> posições, para achar um trecho do nome sem regex
+    """
+
+    def __init__(self, chaves, nomes):
+        self.chaves = chaves
+        self.nomes = nomes
+        self.por_chave = {chave: posicao for posicao, chave in enumerate(chaves)}
+        normalizados = [normalizar_nome(nome) for nome in nomes]
+        self.normalizados = normalizados
+        self.por_nome = {}
+        self.trigramas = {}
+        for posicao, nome in enumerate(normalizados):
+            if not nome:
                 continue
+            self.por_nome.setdefault(nome, []).append(posicao)
+            for trigrama in _trigramas(nome):
+                self.trigramas.setdefault(trigrama, set()).add(posicao)
+        ordem = sorted((nome, posicao) for posicao, nome in enumerate(normalizados) if nome)
+        self.ordenados = [nome for nome, _ in ordem]
+        self.posicoes_ordenadas = [posicao for _, posicao in ordem]
+
+    def posicao(self, chave):
+        """Posição do juiz pela chave da linha (ou None)"""
+        return self.por_chave.get(chave)
+
+    def exatos(self, texto):
+        return list(self.por_nome.get(normalizar_nome(texto), ()))
+
+    def por_prefixo(self, texto):
+        """Posições dos nomes que começam com `texto`, em ordem alfabética"""
+        texto = normalizar_nome(texto)
+        inicio = bisect_left(self.ordenados, texto)
+        fim = bisect_left(self.ordenados, texto + "\uffff", inicio)
+        return self.posicoes_ordenadas[inicio:fim]
+
+    def por_trecho(self, texto):
+        """Posições dos nomes que contêm `texto` (trechos com menos de 3 letras: só prefixo)"""
+        texto = normalizar_nome(texto)
+        trigramas = sorted((self.trigramas.get(t, set()) for t in _trigramas(texto)), key=len)
+        if not trigramas:
+            return self.por_prefixo(texto)
+        candidatos = set.intersection(*trigramas)
+        return sorted(
+            (p for p in candidatos if texto in self.normalizados[p]),
+            key=lambda p: (self.normalizados[p], p),
+        )
+
+    def sugerir(self, texto, limite=10):
+        """Até `limite` posições para um nome digitado: exatos, depois prefixos, depois trechos"""
+        sugestoes = []
+        for posicoes in (self.exatos(texto), self.por_prefixo(texto), self.por_trecho(texto)):
+            for posicao in posicoes:
+                if posicao not in sugestoes:
+                    sugestoes.append(posicao)
+                    if len(sugestoes) >= limite:
+                        return sugestoes
+        return sugestoes
+
+    def resolver(self, juiz):
+        """
+        Posição de um único juiz: pela chave da linha ou, se não for uma chave, pelo nome
+        (exato, senão prefixo único, senão trecho único). None se não encontrado ou ambíguo
+        (ex.: homônimos, ou "Ana" quando só existem "Ana Paula" e "Ana Maria").
+        """
+        if juiz in self.por_chave:
+            return self.por_chave[juiz]
+        if not isinstance(juiz, str) or not normalizar_nome(juiz):
+            return None
+        for busca in (self.exatos, self.por_prefixo, self.por_trecho):
+            posicoes = busca(juiz)
+            if posicoes:
+                return posicoes[0] if len(posicoes) == 1 else None
+        return None
+
+
+def localizar_juiz(df, nome_juiz, indice=None):
+    """
+    Posição do juiz no DataFrame pela chave da linha ou pelo nome (ver IndiceNomes.resolver);
+    None se não encontrado ou se o nome for ambíguo.
+    """
+    if indice is None:
+        indice = IndicePermutas(df)
+    return indice.nomes_indexados().resolver(nome_juiz)
 
-            for k, linha_c in df.iterrows():
-                if k in [i, j]:
-                    continue
-
-                origem_c = normalizar_texto(linha_c.get("Origem"))
-                entrancia_c = linha_c.get("Entrância")
-                destinos_c = [
-                    normalizar_texto(linha_c.get("Destino 1")),
-                    normalizar_texto(linha_c.get("Destino 2")),
-                    normalizar_texto(linha_c.get("Destino 3"))
-                ]
-                destinos_c = [d for d in destinos_c if d]
-
-                if origem_c not in destinos_b:
-                    continue
-
-                for l, linha_d in df.iterrows():
-                    if l in [i, j, k]:
-                        continue
-
-                    origem_d = normalizar_texto(linha_d.get("Origem"))
-                    entrancia_d = linha_d.get("Entrância")
-                    destinos_d = [
-                        normalizar_texto(linha_d.get("Destino 1")),
-                        normalizar_texto(linha_d.get("Destino 2")),
-                        normalizar_texto(linha_d.get("Destino 3"))
-                    ]
-                    destinos_d = [d for d in destinos_d if d]
-
-                    if origem_d not in destinos_c:
-                        continue
-
-                    if origem_a in destinos_d:
-                        quadrangulo = {
-                            "Juiz A": linha_a.get("Nome"),
-                            "Entrância A": entrancia_a,
-                            "Origem A": linha_a.get("Origem"),
-                            "A ➝": linha_b.get("Origem"),
-
-                            "Juiz B": linha_b.get("Nome"),
-                            "Entrância B": entrancia_b,
-                            "Origem B": linha_b.get("Origem"),
-                            "B ➝": linha_c.get("Origem"),
-
-                            "Juiz C": linha_c.get("Nome"),
-                            "Entrância C": entrancia_c,
-                            "Origem C": linha_c.get("Origem"),
-                            "C ➝": linha_d.get("Origem"),
-
-                            "Juiz D": linha_d.get("Nome"),
-                            "Entrância D": entrancia_d,
-                            "Origem D": linha_d.get("Origem"),
-                            "D ➝": linha_a.get("Origem")
-                        }
-
-                        if origem_user and destino_user:
-                            if not (
-                                (origem_a == origem_user and origem_b == destino_user) or
-                                (origem_b == origem_user and origem_c == destino_user) or
-                                (origem_c == origem_user and origem_d == destino_user) or
-                                (origem_d == origem_user and origem_a == destino_user)
-                            ):
-                                continue
-
-                        quadrangulos.append(quadrangulo)
-
-    return quadrangulos
 
+def sugerir_juizes(df, texto, limite=10, indice=None):
+    """(chave, nome) dos juízes que correspondem ao nome digitado, dos mais aos menos exatos"""
+    if indice is None:
+        indice = IndicePermutas(df)
+    nomes = indice.nomes_indexados()
+    return [(indice.chaves[posicao], indice.nomes[posicao]) for posicao in nomes.sugerir(texto, limite)]
 
-# FUNÇÕES AUXILIARES PARA BUSCA POR NOME
-def buscar_permutas_por_nome(df, nome_juiz):
-    """
-    NOVA FUNÇÃO: Busca permutas para um juiz específico pelo nome
-    """
-    # Encontrar dados do juiz
-    juiz_row = df[df["Nome"].str.contains(nome_juiz, case=False, na=False)]
-    if len(juiz_row) == 0:
-        return [], [], []
-    
-    juiz_data = juiz_row.iloc[0]
-    origem_juiz = juiz_data["Origem"]
-    destinos_juiz = [
-        juiz_data.get("Destino 1"),
-        juiz_data.get("Destino 2"),
-        juiz_data.get("Destino 3")
-    ]
-    destinos_juiz = [d for d in destinos_juiz if d and str(d).strip()]
-    
-    casais = []
-    triangulos = []
-    quadrangulos = []
-    
-    # Para cada destino do juiz, buscar combinações
-    for destino in destinos_juiz:
-        # Buscar casais
-        casais_temp = buscar_permutas_diretas(df, origem_juiz, destino)
-        casais.extend(casais_temp)
-        
-        # Buscar triangulações
-        triangulos_temp = buscar_triangulacoes(df, origem_juiz, destino)
-        triangulos.extend(triangulos_temp)
-        
-        # Buscar quadrangulações
-        quadrangulos_temp = buscar_quadrangulacoes(df, origem_juiz, destino)
-        quadrangulos.extend(quadrangulos_temp)
-    
-    return casais, triangulos, quadrangulos
\ No newline at end of file
+
+def buscar_ciclos_por_nome(df, nome_juiz, tamanhos=(2, 3, 4), limite=None, indice=None):
+    """
+    Busca os ciclos de um juiz como tuplas de posições (o juiz sempre na primeira).
+    O juiz pode ser indicado pela chave da linha ou pelo nome (ver localizar_juiz).
+    Devolve (indice, {2: [...], 3: [...], 4: [...]}); os dicionários de exibição
+    ficam para quem for exibir (montar_casal / montar_ciclo).
+    Apenas os tamanhos pedidos em `tamanhos` são buscados; os demais voltam vazios.
+    Com `limite`, cada lista traz só os `limite` melhores ciclos (menor soma de
+    prioridades), em ordem, sem enumerar todos.
+    """
+    if indice is None:
+        indice = IndicePermutas(df)
+    resultados = {2: [], 3: [], 4: []}
+
+    raiz = localizar_juiz(df, nome_juiz, indice)
+    if raiz is None:
+        return indice, resultados
+
+    # Busca enraizada: só os ciclos que passam pelo próprio juiz, todos os tamanhos de uma vez
+    tamanhos = set(tamanhos) & set(resultados)
+    with etapa("busca_por_nome"):
+        # As arestas só são contadas com uma medição ativa (custa uma chamada por aresta)
+        orcamento = Orcamento() if medindo() else None
+        if limite is None:
+            ciclos = enumerar_ciclos_do_juiz(indice, raiz, tamanhos, orcamento)
+        else:
+            melhores = _melhores(indice, limite, tamanhos, raiz, orcamento, por_tamanho=True)
+            ciclos = [ciclo for tamanho in sorted(melhores) for ciclo in melhores[tamanho]]
+
+        for ciclo in ciclos:
+            resultados[len(ciclo)].append(ciclo)
+
+        contar("ciclos_encontrados", sum(len(lista) for lista in resultados.values()))
+        if orcamento is not None:
+            contar("arestas_percorridas", orcamento.passos)
+    return indice, resultados
+
+
+def buscar_permutas_por_nome(df, nome_juiz, tamanhos=(2, 3, 4), limite=None, regra_entrancia=None, indice=None):
+    """
+    Busca casais, triangulações e quadrangulações de um juiz específico pelo nome,
+    já no formato de exibição (ver buscar_ciclos_por_nome).
+    Com `regra_entrancia`, só as combinações entre entrâncias compatíveis; um `indice`
+    já construído (com a mesma regra) evita refazer o índice e o de nomes a cada chamada.
+    """
+    if indice is None and regra_entrancia is not None:
+        indice = IndicePermutas(df, regra_entrancia)
+    indice, ciclos = buscar_ciclos_por_nome(df, nome_juiz, tamanhos, limite, indice)
+    return (
+        [montar_casal(indice, ciclo) for ciclo in ciclos[2]],
+        [montar_ciclo(indice, ciclo) for ciclo in ciclos[3]],
+        [montar_ciclo(indice, ciclo) for ciclo in ciclos[4]],
+    )
@@ -1,10 +1,17 @@
 import streamlit as st
-import gspread
 import pandas as pd
-from algoritmo import buscar_permutas_por_nome
+from algoritmo import buscar_ciclos_por_nome, montar_casal, montar_ciclo
+from instrumentacao import PAINEL_DESEMPENHO, configurar_log, etapa, iniciar_medicao, parar_medicao
+from registro import REGRA_ENTRANCIA, VERSOES_EM_MEMORIA, compilar_registro
+from relatorio import regenerar_em_segundo_plano
+from resultados import (
+    CAMINHO_RESULTADOS, LIMITE_PRE_CALCULADO, PRE_CALCULADO, ArquivoResultados,
+    buscar_ciclos_por_nome_pre_calculados,
+)
+from servico import URL_SERVICO, buscar_ciclos_por_nome_servico
+from sincronizacao import CAMINHO_SNAPSHOT, SnapshotLocal, carregar_snapshot, fonte_padrao, sincronizar
 import unicodedata
 import plotly.graph_objects as go
-from collections import Counter
 
 # ===============================
 # Configuração da página
@@ -15,6 +22,17 @@ st.set_page_config(
     layout="wide"
 )
 
+# Tempos e contadores de cada etapa desta execução do script, só com o painel de
+# desempenho aberto (PERMUTA_DEBUG=1 ou ?debug=1 na URL); sem ele, as etapas vão só
+# para o log e os contadores finos (arestas percorridas) não são pagos
+configurar_log()
+painel_desempenho = PAINEL_DESEMPENHO or st.query_params.get("debug") == "1"
+if painel_desempenho:
+    medicao = iniciar_medicao()
+else:
+    # A thread pode ter rodado antes uma sessão com o painel aberto
+    parar_medicao()
+
 # ===============================
 # Funções auxiliares
 # ===============================
@@ -25,47 +43,12 @@ def normalizar_texto(texto):
     texto_sem_acento = ''.join(c for c in texto_norm if not unicodedata.combining(c))
     return texto_sem_acento.strip().lower()
 
-def obter_prioridade_destino(origem_juiz, destino_final, df):
-    """Retorna a prioridade do destino (1, 2 ou 3) para um juiz"""
-    juiz_row = df[df["Origem"] == origem_juiz]
-    if len(juiz_row) == 0:
-        return ""
-    
-    juiz_data = juiz_row.iloc[0]
-    if juiz_data.get("Destino 1") == destino_final:
-        return "¹"
-    elif juiz_data.get("Destino 2") == destino_final:
-        return "²"
-    elif juiz_data.get("Destino 3") == destino_final:
-        return "³"
-    return ""
-
-def calcular_estatisticas(df):
-    """Calcula estatísticas para os dashboards"""
-    # Tribunais mais procurados
-    destinos = []
-    for col in ["Destino 1", "Destino 2", "Destino 3"]:
-        destinos.extend(df[col].dropna().tolist())
-    tribunais_procurados = Counter(destinos).most_common(5)
-    
-    # Tribunais mais exportadores
-    tribunais_exportadores = df["Origem"].value_counts().head(5)
-    
-    # Tribunais hubs
-    todas_localizacoes = set(df["Origem"].unique())
-    for col in ["Destino 1", "Destino 2", "Destino 3"]:
-        todas_localizacoes.update(df[col].dropna().unique())
-    
-    hub_scores = {}
-    for tribunal in todas_localizacoes:
-        score = len(df[df["Origem"] == tribunal])
-        for col in ["Destino 1", "Destino 2", "Destino 3"]:
-            score += len(df[df[col] == tribunal])
-        hub_scores[tribunal] = score
-    
-    tribunais_hubs = sorted(hub_scores.items(), key=lambda x: x[1], reverse=True)[:5]
-    
-    return tribunais_procurados, tribunais_exportadores, tribunais_hubs
+SOBRESCRITO_PRIORIDADE = {1: "¹", 2: "²", 3: "³"}
+TAMANHO_PAGINA = 50
+
+def marcar_prioridade(prioridade):
+    """Sobrescrito da prioridade do destino (1, 2 ou 3), já calculada na busca para cada participante"""
+    return SOBRESCRITO_PRIORIDADE.get(prioridade, "")
 
 # ===============================
 # CSS personalizado
@@ -125,29 +108,14 @@ st.markdown("""
 # ===============================
 # Função para carregar dados
 # ===============================
-@st.cache_data
-def carregar_dados():
-    creds_dict = st.secrets["google_service_account"]
-    gc = gspread.service_account_from_dict(creds_dict)
-    sheet = gc.open("Permuta - Magistratura Estadual").sheet1
-    data = sheet.get_all_values()
-    df = pd.DataFrame(data[1:], columns=data[0])
-
-    # Limpeza de dados
-    if "Entrância" not in df.columns:
-        df["Entrância"] = None
-
-    for coluna in ["Destino 1", "Destino 2", "Destino 3", "E-mail", "Entrância"]:
-        if coluna in df.columns:
-            df[coluna] = df[coluna].apply(lambda x: str(x).strip() if pd.notnull(x) and str(x).strip() != "" else None)
-
-    df["Nome"] = df["Nome"].str.strip()
-    df["Origem"] = df["Origem"].str.strip()
-    
-    # Filtrar apenas registros válidos
-    df = df[df["Nome"].notna() & (df["Nome"] != "") & df["Origem"].notna() & (df["Origem"] != "")]
-    
-    return df
+def obter_fonte():
+    return fonte_padrao(st.secrets.get("google_service_account"))
+
+@st.cache_resource(max_entries=VERSOES_EM_MEMORIA)
+def carregar_registro(versao):
+    # Partida a frio a partir do snapshot local; limpeza, codificação, índice e estatísticas
+    # feitos uma única vez por versão e compartilhados (sem cópia) entre todas as sessões
+    return compilar_registro(carregar_snapshot(obter_fonte(), SnapshotLocal(CAMINHO_SNAPSHOT)))
 
 # ===============================
 # Interface principal
@@ -159,22 +127,34 @@ st.markdown('<p class="sub-header">Sistema colaborativo e gratuito para interess
 col_update1, col_update2, col_update3 = st.columns([1, 2, 1])
 with col_update2:
     if st.button("🔄 Atualizar base de dados agora"):
-        st.cache_data.clear()
-        st.success("✅ Base de dados atualizada!")
+        # Baixa só o que mudou desde a última sincronização; se algo mudou, a versão do
+        # snapshot muda e o registro da nova versão é montado na próxima leitura
+        resumo = sincronizar(obter_fonte(), SnapshotLocal(CAMINHO_SNAPSHOT))
+        st.success(
+            f"✅ Base de dados atualizada! {len(resumo['adicionadas'])} nova(s), "
+            f"{len(resumo['alteradas'])} alterada(s), {len(resumo['removidas'])} removida(s)."
+        )
 
 # Carregar dados
-df = carregar_dados()
+with etapa("carregar_registro"):
+    registro = carregar_registro(SnapshotLocal(CAMINHO_SNAPSHOT).versao())
+df = registro.df
+
+# Modo pré-calculado: a busca vira uma consulta ao arquivo de resultados, regerado em
+# outro processo, com prazo, sempre que os dados mudam (até lá, a busca continua ao vivo)
+arquivo_resultados = ArquivoResultados(CAMINHO_RESULTADOS) if PRE_CALCULADO else None
+if arquivo_resultados is not None and not arquivo_resultados.atualizado(df):
+    regenerar_em_segundo_plano(df, arquivo_resultados, CAMINHO_SNAPSHOT, limite=LIMITE_PRE_CALCULADO)
 
 # Login por e-mail
-emails_autorizados = set(df["E-mail"].dropna().unique())
 email_user = st.text_input("Digite seu e-mail para acessar a aplicação:")
 
-if email_user not in emails_autorizados:
+if not registro.autorizado(email_user):
     st.warning("⚠️ Acesso restrito. Seu e-mail não está cadastrado na base de dados.")
     st.stop()
 
 # Estatísticas
-tribunais_procurados, tribunais_exportadores, tribunais_hubs = calcular_estatisticas(df)
+tribunais_procurados, tribunais_exportadores, tribunais_hubs = registro.estatisticas
 
 # Métricas numéricas
 col1, col2, col3 = st.columns(3)
@@ -196,7 +176,7 @@ with col2:
     """, unsafe_allow_html=True)
 
 with col3:
-    tribunais_unicos = len(set(df["Origem"].unique()))
+    tribunais_unicos = registro.tribunais_envolvidos
     st.markdown(f"""
     <div class="metric-card">
         <div class="metric-number">{tribunais_unicos}</div>
@@ -247,8 +227,10 @@ with col3:
 st.markdown("### 🔍 Escolha seus critérios")
 
 # Seleção do nome
-nomes_disponiveis = sorted(df["Nome"].unique())
-nome_selecionado = st.selectbox("👤 Selecione seu nome:", [""] + nomes_disponiveis)
+# O valor escolhido é a chave da linha (identifica o juiz mesmo entre homônimos)
+juiz_selecionado = st.selectbox(
+    "👤 Selecione seu nome:", (None,) + registro.opcoes, format_func=registro.rotulo
+)
 
 # Tipos de busca
 st.markdown("**Tipos de combinações a buscar:**")
@@ -260,14 +242,50 @@ with col2:
 with col3:
     buscar_quadrangulos = st.checkbox("🔷 Quadrangulação", value=True)
 
-# Busca
+# Compatibilidade de entrância: a regra configurada em PERMUTA_ENTRANCIA ou, sem ela, a mesma entrância
+somente_compativeis = st.checkbox(
+    "⚖️ Somente entrâncias compatíveis" if REGRA_ENTRANCIA is not None else "⚖️ Somente a mesma entrância",
+    value=REGRA_ENTRANCIA is not None,
+)
+regra = (REGRA_ENTRANCIA or "mesma") if somente_compativeis else None
+
+# Busca (o nome buscado e a quantidade de páginas ficam na sessão para a paginação)
 if st.button("🔍 Buscar Permutas e Combinações"):
-    if not nome_selecionado:
+    if juiz_selecionado is None:
         st.warning("⚠️ Por favor, selecione seu nome para realizar a busca.")
         st.stop()
-    
-    # Buscar combinações usando a função que funciona
-    casais, triangulos, quadrangulos = buscar_permutas_por_nome(df, nome_selecionado)
+    st.session_state["busca_juiz"] = juiz_selecionado
+    st.session_state["busca_paginas"] = 1
+
+def carregar_mais_resultados():
+    st.session_state["busca_paginas"] += 1
+
+if juiz_selecionado is not None and st.session_state.get("busca_juiz") == juiz_selecionado:
+    # Buscar, em uma única travessia, apenas os tipos marcados, e só os melhores de cada tipo
+    tamanhos = [tamanho for tamanho, marcado in ((2, buscar_casais), (3, buscar_triangulos), (4, buscar_quadrangulos)) if marcado]
+    limite = TAMANHO_PAGINA * st.session_state["busca_paginas"]
+    # Os ciclos vêm como tuplas de posições; os campos de exibição são montados só na tabela
+    with etapa("busca", limite=limite) as medida:
+        resultado = None
+        # O arquivo pré-calculado e o serviço cobrem a busca sem regra de entrância
+        if arquivo_resultados is not None and regra is None:
+            resultado = buscar_ciclos_por_nome_pre_calculados(
+                arquivo_resultados, df, juiz_selecionado, tamanhos, limite, registro.indice
+            )
+            medida["contadores"]["pre_calculado"] = resultado is not None
+        # Com PERMUTA_SERVICO, a busca é feita pelo serviço compartilhado (servico.py);
+        # se ele não responder ou estiver em outra versão dos dados, a busca é local
+        if resultado is None and URL_SERVICO and regra is None:
+            resultado = buscar_ciclos_por_nome_servico(
+                URL_SERVICO, df, juiz_selecionado, tamanhos, limite, registro.indice
+            )
+            medida["contadores"]["servico"] = resultado is not None
+        if resultado is None:
+            resultado = buscar_ciclos_por_nome(
+                df, juiz_selecionado, tamanhos, limite=limite, indice=registro.indice_entrancia(regra)
+            )
+    indice, ciclos = resultado
+    casais, triangulos, quadrangulos = ciclos[2], ciclos[3], ciclos[4]
     
     resultados_encontrados = False
     
@@ -278,21 +296,23 @@ if st.button("🔍 Buscar Permutas e Combinações"):
         st.markdown("**Legenda:** 🔵 Destino 1 | 🟢 Destino 2 | 🔴 Destino 3")
         
         # Tabela simplificada
-        casais_tabela = []
-        for casal in casais:
-            prioridade_a = obter_prioridade_destino(casal["Origem A"], casal["Destino A"], df)
-            prioridade_b = obter_prioridade_destino(casal["Origem B"], casal["Destino B"], df)
+        with etapa("tabela_casais", linhas=len(casais)):
+            casais_tabela = []
+            for ciclo in casais:
+                casal = montar_casal(indice, ciclo)
+                prioridade_a = marcar_prioridade(casal["Prioridade A"])
+                prioridade_b = marcar_prioridade(casal["Prioridade B"])
             
-            casais_tabela.append({
-                "👤 Seu Nome": casal["Juiz A"],
-                "📍 Sua Origem": casal["Origem A"],
-                "🎯 Você vai para": f"{casal['Destino A']}{prioridade_a}",
-                "🤝 Parceiro": casal["Juiz B"],
-                "📍 Origem do Parceiro": casal["Origem B"],
-                "🎯 Parceiro vai para": f"{casal['Destino B']}{prioridade_b}"
-            })
+                casais_tabela.append({
+                    "👤 Seu Nome": casal["Juiz A"],
+                    "📍 Sua Origem": casal["Origem A"],
+                    "🎯 Você vai para": f"{casal['Destino A']}{prioridade_a}",
+                    "🤝 Parceiro": casal["Juiz B"],
+                    "📍 Origem do Parceiro": casal["Origem B"],
+                    "🎯 Parceiro vai para": f"{casal['Destino B']}{prioridade_b}"
+                })
         
-        st.dataframe(pd.DataFrame(casais_tabela), use_container_width=True, hide_index=True)
+            st.dataframe(pd.DataFrame(casais_tabela), use_container_width=True, hide_index=True)
     
     # Exibir triangulações
     if buscar_triangulos and triangulos:
@@ -300,23 +320,25 @@ if st.button("🔍 Buscar Permutas e Combinações"):
         st.success(f"🔺 **{len(triangulos)} triangulação(ões) encontrada(s):**")
         st.markdown("**Legenda:** 🔵 Destino 1 | 🟢 Destino 2 | 🔴 Destino 3")
         
-        triangulos_tabela = []
-        for i, tri in enumerate(triangulos, 1):
-            prioridade_a = obter_prioridade_destino(tri["Origem A"], tri["A ➝"], df)
-            prioridade_b = obter_prioridade_destino(tri["Origem B"], tri["B ➝"], df)
-            prioridade_c = obter_prioridade_destino(tri["Origem C"], tri["C ➝"], df)
+        with etapa("tabela_triangulacoes", linhas=len(triangulos)):
+            triangulos_tabela = []
+            for i, ciclo in enumerate(triangulos, 1):
+                tri = montar_ciclo(indice, ciclo)
+                prioridade_a = marcar_prioridade(tri["Prioridade A"])
+                prioridade_b = marcar_prioridade(tri["Prioridade B"])
+                prioridade_c = marcar_prioridade(tri["Prioridade C"])
             
-            fluxo = f"{tri['Juiz A']} → {tri['A ➝']}{prioridade_a} → {tri['Juiz B']} → {tri['B ➝']}{prioridade_b} → {tri['Juiz C']} → {tri['C ➝']}{prioridade_c}"
+                fluxo = f"{tri['Juiz A']} → {tri['A ➝']}{prioridade_a} → {tri['Juiz B']} → {tri['B ➝']}{prioridade_b} → {tri['Juiz C']} → {tri['C ➝']}{prioridade_c}"
             
-            triangulos_tabela.append({
-                "🔢": f"#{i}",
-                "👤 Participante A": f"{tri['Juiz A']} ({tri['Origem A']})",
-                "👤 Participante B": f"{tri['Juiz B']} ({tri['Origem B']})",
-                "👤 Participante C": f"{tri['Juiz C']} ({tri['Origem C']})",
-                "🔄 Fluxo": fluxo
-            })
+                triangulos_tabela.append({
+                    "🔢": f"#{i}",
+                    "👤 Participante A": f"{tri['Juiz A']} ({tri['Origem A']})",
+                    "👤 Participante B": f"{tri['Juiz B']} ({tri['Origem B']})",
+                    "👤 Participante C": f"{tri['Juiz C']} ({tri['Origem C']})",
+                    "🔄 Fluxo": fluxo
+                })
         
-        st.dataframe(pd.DataFrame(triangulos_tabela), use_container_width=True, hide_index=True)
+            st.dataframe(pd.DataFrame(triangulos_tabela), use_container_width=True, hide_index=True)
     
     # Exibir quadrangulações
     if buscar_quadrangulos and quadrangulos:
@@ -324,25 +346,27 @@ if st.button("🔍 Buscar Permutas e Combinações"):
         st.success(f"🔷 **{len(quadrangulos)} quadrangulação(ões) encontrada(s):**")
         st.markdown("**Legenda:** 🔵 Destino 1 | 🟢 Destino 2 | 🔴 Destino 3")
         
-        quadrangulos_tabela = []
-        for i, quad in enumerate(quadrangulos, 1):
-            prioridade_a = obter_prioridade_destino(quad["Origem A"], quad["A ➝"], df)
-            prioridade_b = obter_prioridade_destino(quad["Origem B"], quad["B ➝"], df)
-            prioridade_c = obter_prioridade_destino(quad["Origem C"], quad["C ➝"], df)
-            prioridade_d = obter_prioridade_destino(quad["Origem D"], quad["D ➝"], df)
+        with etapa("tabela_quadrangulacoes", linhas=len(quadrangulos)):
+            quadrangulos_tabela = []
+            for i, ciclo in enumerate(quadrangulos, 1):
+                quad = montar_ciclo(indice, ciclo)
+                prioridade_a = marcar_prioridade(quad["Prioridade A"])
+                prioridade_b = marcar_prioridade(quad["Prioridade B"])
+                prioridade_c = marcar_prioridade(quad["Prioridade C"])
+                prioridade_d = marcar_prioridade(quad["Prioridade D"])
             
-            fluxo = f"{quad['Juiz A']} → {quad['A ➝']}{prioridade_a} → {quad['Juiz B']} → {quad['B ➝']}{prioridade_b} → {quad['Juiz C']} → {quad['C ➝']}{prioridade_c} → {quad['Juiz D']} → {quad['D ➝']}{prioridade_d}"
+                fluxo = f"{quad['Juiz A']} → {quad['A ➝']}{prioridade_a} → {quad['Juiz B']} → {quad['B ➝']}{prioridade_b} → {quad['Juiz C']} → {quad['C ➝']}{prioridade_c} → {quad['Juiz D']} → {quad['D ➝']}{prioridade_d}"
             
-            quadrangulos_tabela.append({
-                "🔢": f"#{i}",
-                "👤 Participante A": f"{quad['Juiz A']} ({quad['Origem A']})",
-                "👤 Participante B": f"{quad['Juiz B']} ({quad['Origem B']})",
-                "👤 Participante C": f"{quad['Juiz C']} ({quad['Origem C']})",
-                "👤 Participante D": f"{quad['Juiz D']} ({quad['Origem D']})",
-                "🔄 Fluxo": fluxo
-            })
+                quadrangulos_tabela.append({
+                    "🔢": f"#{i}",
+                    "👤 Participante A": f"{quad['Juiz A']} ({quad['Origem A']})",
+                    "👤 Participante B": f"{quad['Juiz B']} ({quad['Origem B']})",
+                    "👤 Participante C": f"{quad['Juiz C']} ({quad['Origem C']})",
+                    "👤 Participante D": f"{quad['Juiz D']} ({quad['Origem D']})",
+                    "🔄 Fluxo": fluxo
+                })
         
-        st.dataframe(pd.DataFrame(quadrangulos_tabela), use_container_width=True, hide_index=True)
+            st.dataframe(pd.DataFrame(quadrangulos_tabela), use_container_width=True, hide_index=True)
     
     # Mensagens de ausência de resultados
     if buscar_casais and not casais:
@@ -357,9 +381,19 @@ if st.button("🔍 Buscar Permutas e Combinações"):
     if not resultados_encontrados:
         st.info("ℹ️ **Nenhum resultado:** Não foram encontradas combinações possíveis com os critérios selecionados.")
 
+    # Paginação: as listas vêm ordenadas pela soma das prioridades; uma lista cheia pode ter mais resultados
+    if any(len(lista) >= limite for lista in (casais, triangulos, quadrangulos)):
+        st.caption(f"Mostrando até {limite} resultados de cada tipo, dos mais prioritários para os menos prioritários.")
+        st.button("➕ Carregar mais resultados", on_click=carregar_mais_resultados)
+
 # Base completa
 with st.expander("📂 Ver base de dados completa"):
-    st.dataframe(df, use_container_width=True)
+    st.dataframe(df[registro.colunas_exibicao], use_container_width=True)
+
+# Painel de desempenho (opcional: PERMUTA_DEBUG=1 ou ?debug=1 na URL)
+if painel_desempenho:
+    with st.expander(f"⏱️ Desempenho desta execução ({medicao.total_ms()} ms)"):
+        st.dataframe(pd.DataFrame(medicao.tabela()), use_container_width=True, hide_index=True)
 
 # Rodapé
 st.markdown("""
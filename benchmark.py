@@ -0,0 +1,280 @@
+"""
+Medição de desempenho das buscas sobre cadastros sintéticos (sintetico.py).
+
+Para cada tamanho de cadastro, mede o tempo (melhor de N repetições) e o pico de
+memória de cada operação, confere a busca contra uma força bruta independente em
+um cadastro pequeno e compara com a linha de base salva: tempos acima da
+tolerância ou contagens de ciclos diferentes (mesma semente, mesmos dados) são
+regressões e fazem o comando sair com código 1.
+
+    python benchmark.py --tamanhos 100 1000 10000 --salvar
+    python benchmark.py --tamanhos 100 1000 10000
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tracemalloc
+from itertools import permutations
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+import estatisticas
+from algoritmo import (
+    COLUNAS_DESTINO, IndicePermutas, buscar_ciclos, buscar_ciclos_por_nome, buscar_permutas_diretas,
+    buscar_quadrangulacoes, buscar_triangulacoes, enumerar_ciclos_do_juiz, normalizar_texto,
+)
+from dados import normalizar_tribunal, preparar_dados
+from sintetico import gerar_cadastro
+
+CAMINHO_BASE = os.path.join(".dados", "benchmark_base.json")
+# Maior cadastro em que cada busca global (todos os ciclos de um tamanho) é medida;
+# acima disso a quantidade de ciclos cresce demais para uma rodada de medição
+MAXIMO_GLOBAL = {2: 50_000, 3: 1_000, 4: 250}
+JUIZES_AMOSTRADOS = 20
+# Buscas enraizadas de um só tamanho de ciclo, medidas em todos os cadastros (inclusive
+# acima de MAXIMO_GLOBAL) com os primeiros juízes da amostra: com 10 mil juízes, uma
+# busca de quadrangulações leva de segundos a minutos
+JUIZES_POR_TAMANHO = 3
+# Diferença de tempo (s) abaixo da qual não há regressão, qualquer que seja a proporção:
+# operações de poucos milissegundos variam mais do que a tolerância entre duas rodadas
+FOLGA_MINIMA = 0.02
+
+
+def _medir(funcao, repeticoes, memoria):
+    """(melhor tempo em segundos, pico de memória em MB ou None, resultado)"""
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = perf_counter()
+        resultado = funcao()
+        melhor = min(melhor, perf_counter() - inicio)
+    pico = None
+    if memoria:
+        tracemalloc.start()
+        funcao()
+        pico = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return melhor, pico, resultado
+
+
+def _operacoes(df, n, semente, sem_limite_global=False):
+    """Operações medidas neste tamanho: nome -> (função, contagem de ciclos do resultado)"""
+    indice = IndicePermutas(df)
+    usuario = df.iloc[0]
+    origem, destino = usuario["Origem"], usuario["Destino 1"]
+    amostra = np.random.default_rng(semente).choice(len(df), size=min(JUIZES_AMOSTRADOS, len(df)), replace=False)
+    chaves = [indice.chaves[posicao] for posicao in amostra]
+
+    def estatisticas_sem_cache():
+        estatisticas._cache_estatisticas.clear()
+        return estatisticas.calcular_estatisticas(df)
+
+    def busca_por_nome():
+        return [buscar_ciclos_por_nome(df, chave, limite=50, indice=indice)[1] for chave in chaves]
+
+    def busca_por_tamanho(tamanho):
+        return lambda: [
+            buscar_ciclos_por_nome(df, chave, (tamanho,), limite=50, indice=indice)[1][tamanho]
+            for chave in chaves[:JUIZES_POR_TAMANHO]
+        ]
+
+    operacoes = {
+        "indice": (lambda: IndicePermutas(df), lambda r: None),
+        "estatisticas": (estatisticas_sem_cache, lambda r: None),
+        f"busca_por_nome ({len(chaves)} juízes)": (busca_por_nome, lambda r: sum(len(c) for d in r for c in d.values())),
+    }
+    for tamanho in (2, 3, 4):
+        nome = f"busca_por_nome_{tamanho} ({len(chaves[:JUIZES_POR_TAMANHO])} juízes)"
+        operacoes[nome] = (busca_por_tamanho(tamanho), lambda r: sum(len(ciclos) for ciclos in r))
+    globais = [
+        (2, "permutas_diretas", lambda: buscar_permutas_diretas(df, origem, destino, indice)),
+        (2, "permutas_diretas_numpy", lambda: buscar_permutas_diretas(df, origem, destino, indice, backend="numpy")),
+        (3, "triangulacoes", lambda: buscar_triangulacoes(df, origem, destino, indice)),
+        (3, "triangulacoes_numpy", lambda: buscar_triangulacoes(df, origem, destino, indice, backend="numpy")),
+        (4, "quadrangulacoes", lambda: buscar_quadrangulacoes(df, origem, destino, indice)),
+    ]
+    for tamanho, nome, funcao in globais:
+        if sem_limite_global or n <= MAXIMO_GLOBAL[tamanho]:
+            operacoes[nome] = (funcao, len)
+    return operacoes
+
+
+# Regras de entrância conferidas: nenhuma, a mesma e uma matriz com um ciclo de
+# entrâncias (Inicial -> Intermediária -> Final -> Inicial), que depende do sentido
+REGRAS_VERIFICACAO = (None, "mesma", {
+    "Inicial": ["Inicial", "Intermediária"], "Intermediária": ["Intermediária", "Final"], "Final": ["Final", "Inicial"],
+})
+
+
+def _aceita_entrancia(regra):
+    """(entrância de quem se move, entrância da vaga) -> permitido, pela definição da regra"""
+    if regra is None:
+        return lambda entrancia, vaga: True
+    if regra == "mesma":
+        return lambda entrancia, vaga: entrancia == vaga
+    matriz = {normalizar_texto(e): {normalizar_texto(a) for a in aceitas} for e, aceitas in regra.items()}
+    return lambda entrancia, vaga: vaga in matriz.get(entrancia, {entrancia})
+
+
+def ciclos_referencia(df, tamanho, regra=None):
+    """
+    Força bruta independente do índice: todas as sequências de `tamanho` juízes distintos,
+    conferidas pela definição (cada um quer a origem do seguinte e, com uma regra de
+    entrância, pode ocupar a vaga dele). Só para cadastros pequenos.
+    """
+    origens = [normalizar_tribunal(origem) for origem in df["Origem"]]
+    entrancias = [normalizar_texto(entrancia) for entrancia in df["Entrância"]]
+    aceita = _aceita_entrancia(regra)
+    desejos = [
+        {normalizar_tribunal(linha[c]) for c in COLUNAS_DESTINO} - {""}
+        for _, linha in df[COLUNAS_DESTINO].iterrows()
+    ]
+    return {
+        sequencia for sequencia in permutations(range(len(df)), tamanho)
+        if sequencia[0] == min(sequencia)
+        and all(
+            origens[proximo] in desejos[atual] and aceita(entrancias[atual], entrancias[proximo])
+            for atual, proximo in zip(sequencia, sequencia[1:] + sequencia[:1])
+        )
+    }
+
+
+def _verificar_cadastro(df, regra):
+    indice = IndicePermutas(df, regra)
+    origens = [normalizar_tribunal(origem) for origem in df["Origem"]]
+    funcoes = {2: buscar_permutas_diretas, 3: buscar_triangulacoes, 4: buscar_quadrangulacoes}
+    divergencias = []
+    for tamanho in (2, 3, 4):
+        esperado = ciclos_referencia(df, tamanho, regra)
+        encontrados = buscar_ciclos(df, tamanho, tamanho, indice=indice, montar=False)["ciclos"][tamanho]
+        if set(encontrados) != esperado or len(encontrados) != len(esperado):
+            divergencias.append(f"busca global de {tamanho}: {len(encontrados)} ciclos, esperados {len(esperado)}")
+        for raiz in range(len(df)):
+            enraizados = {tuple(sorted(c)) for c in enumerar_ciclos_do_juiz(indice, raiz, {tamanho})}
+            if enraizados != {tuple(sorted(c)) for c in esperado if raiz in c}:
+                divergencias.append(f"busca enraizada de {tamanho} no juiz {raiz}")
+                break
+
+        # Sem filtro e filtrado pelo primeiro movimento de um ciclo esperado (tribunal, sem a entrância)
+        filtros = [(None, None, len(esperado))]
+        if esperado:
+            a, b = min(esperado)[:2]
+            filtrados = [
+                c for c in esperado
+                if any(origens[x] == origens[a] and origens[y] == origens[b] for x, y in zip(c, c[1:] + c[:1]))
+            ]
+            filtros.append((df["Origem"].iloc[a], df["Origem"].iloc[b], len(filtrados)))
+        funcao = funcoes[tamanho]
+        for backend in ("python", "numpy") if tamanho < 4 else ("python",):
+            argumentos = {"backend": backend} if tamanho < 4 else {}
+            for origem, destino, quantidade_esperada in filtros:
+                quantidade = len(funcao(df, origem, destino, indice, **argumentos))
+                if quantidade != quantidade_esperada:
+                    divergencias.append(
+                        f"{funcao.__name__} ({backend}, {origem} -> {destino}): {quantidade} resultados,"
+                        f" esperados {quantidade_esperada}"
+                    )
+    return divergencias
+
+
+def verificar(n=30, semente=0):
+    """Lista de divergências entre a busca e a força bruta (vazia se tudo confere)"""
+    divergencias = []
+    for concentracao in (0.5, 2.5):
+        df = preparar_dados(gerar_cadastro(n, semente, concentracao=concentracao))
+        for regra in REGRAS_VERIFICACAO:
+            nome_regra = "matriz" if isinstance(regra, dict) else regra or "livre"
+            divergencias += [
+                f"concentração {concentracao}, entrância {nome_regra}: {divergencia}"
+                for divergencia in _verificar_cadastro(df, regra)
+            ]
+    return divergencias
+
+
+def executar(tamanhos, repeticoes=3, semente=0, memoria=True, sem_limite_global=False):
+    """{"operação@n": {"segundos", "pico_mb", "ciclos"}} para cada tamanho de cadastro"""
+    resultados = {}
+    for n in tamanhos:
+        df = preparar_dados(gerar_cadastro(n, semente))
+        for nome, (funcao, contar) in _operacoes(df, n, semente, sem_limite_global).items():
+            segundos, pico, resultado = _medir(funcao, repeticoes, memoria)
+            resultados[f"{nome}@{n}"] = {"segundos": segundos, "pico_mb": pico, "ciclos": contar(resultado)}
+            print(f"{n:>7} {nome:<32} {segundos * 1000:>10.1f} ms" + (f" {pico:>8.1f} MB" if pico is not None else ""))
+    return resultados
+
+
+def comparar(resultados, base, tolerancia, folga=FOLGA_MINIMA):
+    """
+    Regressões em relação à linha de base: contagem diferente, ou lentidão acima da
+    tolerância e de `folga` segundos ao mesmo tempo
+    """
+    regressoes = []
+    for chave, atual in resultados.items():
+        anterior = base.get(chave)
+        if anterior is None:
+            continue
+        if atual["ciclos"] != anterior["ciclos"]:
+            regressoes.append(f"{chave}: {atual['ciclos']} ciclos, linha de base {anterior['ciclos']}")
+        lentidao = atual["segundos"] - anterior["segundos"]
+        if lentidao > folga and atual["segundos"] > anterior["segundos"] * (1 + tolerancia):
+            regressoes.append(f"{chave}: {atual['segundos']:.4f}s, linha de base {anterior['segundos']:.4f}s")
+    return regressoes
+
+
+def ambiente():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "maquina": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Benchmark das buscas de permutas")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--base", default=CAMINHO_BASE, help="arquivo JSON da linha de base")
+    parser.add_argument("--salvar", action="store_true", help="grava os resultados como nova linha de base")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="lentidão aceita (0.25 = 25%%)")
+    parser.add_argument("--folga", type=float, default=FOLGA_MINIMA, help="lentidão sempre aceita, em segundos")
+    parser.add_argument("--sem-memoria", action="store_true", help="não mede o pico de memória")
+    parser.add_argument("--sem-verificacao", action="store_true", help="não confere contra a força bruta")
+    parser.add_argument("--sem-limite-global", action="store_true", help="mede as buscas globais em todos os tamanhos")
+    args = parser.parse_args(argumentos)
+
+    falhas = []
+    if not args.sem_verificacao:
+        divergencias = verificar(semente=args.semente)
+        print("✅ Busca confere com a força bruta" if not divergencias else "❌ Divergências na busca:")
+        falhas += divergencias
+
+    resultados = executar(args.tamanhos, args.repeticoes, args.semente, not args.sem_memoria, args.sem_limite_global)
+
+    if os.path.exists(args.base):
+        with open(args.base, encoding="utf-8") as arquivo:
+            base = json.load(arquivo)
+        regressoes = comparar(resultados, base["resultados"], args.tolerancia, args.folga)
+        print("✅ Sem regressões em relação à linha de base" if not regressoes else "❌ Regressões:")
+        falhas += regressoes
+
+    if args.salvar:
+        pasta = os.path.dirname(args.base)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        with open(args.base, "w", encoding="utf-8") as arquivo:
+            json.dump({"ambiente": ambiente(), "resultados": resultados}, arquivo, indent=2, ensure_ascii=False)
+        print(f"💾 Linha de base salva em {args.base}")
+
+    for falha in falhas:
+        print(f"   {falha}")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""
+Teste de carga: muitos juízes buscando ao mesmo tempo (ex.: logo após o anúncio de um prazo).
+
+Repete uma mistura realista de operações sobre um cadastro sintético (sintetico.py)
+ou sobre o snapshot local, com `--concorrencia` usuários simultâneos, em threads
+(como as sessões do Streamlit, que dividem o mesmo processo e o registro compilado)
+ou em processos. Cada usuário faz suas operações em sequência; a latência de cada
+uma é medida sob a disputa com os demais. Sai a vazão total e, por operação, a
+vazão e as latências p50/p95/p99.
+
+Operações (pesos em --mistura):
+- busca_app: o caminho do app (chave do selectbox, índice compilado, tabela montada)
+- busca_por_nome: buscar_permutas_por_nome, a função da biblioteca a partir do nome
+- sugestoes: sugestões de nomes para um trecho digitado
+- estatisticas: estatísticas dos dashboards (em cache por versão, como no app)
+- estatisticas_sem_cache: as mesmas, recalculadas a cada chamada
+
+    python carga.py --juizes 5000 --concorrencia 1 8 32 --operacoes 400
+    python carga.py --snapshot .dados/snapshot.sqlite --modo processos --concorrencia 4
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from time import perf_counter, sleep
+
+import numpy as np
+
+import estatisticas
+from algoritmo import buscar_ciclos_por_nome, buscar_permutas_por_nome, montar_casal, montar_ciclo, sugerir_juizes
+from dados import preparar_dados
+from registro import compilar_registro
+from sincronizacao import SnapshotLocal, carregar_snapshot, fonte_padrao
+from sintetico import gerar_cadastro
+
+MISTURA_PADRAO = {"busca_app": 6, "busca_por_nome": 1, "sugestoes": 1, "estatisticas": 2}
+# Resultados por tipo em cada busca (uma página do app)
+LIMITE_PADRAO = 50
+PERCENTIS = (50, 95, 99)
+
+_registro = None
+
+
+def _busca_app(registro, chave, limite):
+    indice, ciclos = buscar_ciclos_por_nome(registro.df, chave, (2, 3, 4), limite=limite, indice=registro.indice)
+    return (
+        [montar_casal(indice, ciclo) for ciclo in ciclos[2]]
+        + [montar_ciclo(indice, ciclo) for tamanho in (3, 4) for ciclo in ciclos[tamanho]]
+    )
+
+
+def _estatisticas_sem_cache(registro):
+    estatisticas._cache_estatisticas.pop((registro.impressao_digital, 5), None)
+    return estatisticas.calcular_estatisticas(registro.df)
+
+
+def executar_operacao(registro, operacao, posicao, limite):
+    """Executa uma operação para o juiz na `posicao` do índice"""
+    indice = registro.indice
+    if operacao == "busca_app":
+        return _busca_app(registro, indice.chaves[posicao], limite)
+    if operacao == "busca_por_nome":
+        return buscar_permutas_por_nome(registro.df, indice.nomes[posicao], limite=limite, indice=indice)
+    if operacao == "sugestoes":
+        return sugerir_juizes(registro.df, indice.nomes[posicao][:5], indice=indice)
+    if operacao == "estatisticas":
+        return estatisticas.calcular_estatisticas(registro.df)
+    if operacao == "estatisticas_sem_cache":
+        return _estatisticas_sem_cache(registro)
+    raise ValueError(f"Operação desconhecida: {operacao}")
+
+
+def sortear_operacoes(quantidade, n_juizes, mistura, semente=0):
+    """Lista de (operação, posição do juiz) sorteada com os pesos da mistura"""
+    rng = np.random.default_rng(semente)
+    nomes = sorted(mistura)
+    pesos = np.array([mistura[nome] for nome in nomes], dtype=float)
+    escolhas = rng.choice(len(nomes), size=quantidade, p=pesos / pesos.sum())
+    posicoes = rng.integers(n_juizes, size=quantidade)
+    return [(nomes[e], int(p)) for e, p in zip(escolhas, posicoes)]
+
+
+def _usuario(registro, operacoes, limite, pausa):
+    """Um usuário: faz as suas operações em sequência; devolve (operação, segundos) de cada uma"""
+    medidas = []
+    for operacao, posicao in operacoes:
+        inicio = perf_counter()
+        executar_operacao(registro, operacao, posicao, limite)
+        medidas.append((operacao, perf_counter() - inicio))
+        if pausa:
+            sleep(pausa)
+    return medidas
+
+
+def _inicializar(df):
+    global _registro
+    _registro = compilar_registro(df)
+
+
+def _aquecer(_):
+    sleep(0.05)
+    return os.getpid()
+
+
+def _usuario_em_processo(operacoes, limite, pausa):
+    return _usuario(_registro, operacoes, limite, pausa)
+
+
+def rodada(registro, operacoes, concorrencia, modo="threads", limite=LIMITE_PADRAO, pausa=0.0):
+    """
+    Reparte as operações entre `concorrencia` usuários simultâneos e as executa.
+    Devolve ({operação: [segundos, ...]}, duração total em segundos).
+    """
+    lotes = [operacoes[i::concorrencia] for i in range(concorrencia)]
+    if modo == "threads":
+        executor = ThreadPoolExecutor(concorrencia)
+        inicio = perf_counter()
+        with executor:
+            tarefas = [executor.submit(_usuario, registro, lote, limite, pausa) for lote in lotes]
+            medidas = [tarefa.result() for tarefa in tarefas]
+    elif modo == "processos":
+        # Os processos sobem e compilam o registro antes de o relógio começar
+        executor = ProcessPoolExecutor(concorrencia, initializer=_inicializar, initargs=(registro.df,))
+        with executor:
+            list(executor.map(_aquecer, range(concorrencia)))
+            inicio = perf_counter()
+            tarefas = [executor.submit(_usuario_em_processo, lote, limite, pausa) for lote in lotes]
+            medidas = [tarefa.result() for tarefa in tarefas]
+    else:
+        raise ValueError("modo deve ser 'threads' ou 'processos'")
+    duracao = perf_counter() - inicio
+
+    por_operacao = {}
+    for operacao, segundos in (medida for lote in medidas for medida in lote):
+        por_operacao.setdefault(operacao, []).append(segundos)
+    return por_operacao, duracao
+
+
+def resumir(por_operacao, duracao):
+    """Linhas {operacao, quantidade, vazao (op/s), p50/p95/p99/max (ms)}, mais a linha do total"""
+    linhas = []
+    todas = [segundos for lista in por_operacao.values() for segundos in lista]
+    for operacao, lista in sorted(por_operacao.items()) + [("total", todas)]:
+        ms = np.array(lista) * 1000
+        linha = {"operacao": operacao, "quantidade": len(lista), "vazao": len(lista) / duracao}
+        linha.update({f"p{p}": float(np.percentile(ms, p)) for p in PERCENTIS})
+        linha["max"] = float(ms.max())
+        linhas.append(linha)
+    return linhas
+
+
+def imprimir(linhas, concorrencia, modo, duracao):
+    print(f"\n{concorrencia} usuários simultâneos ({modo}), {duracao:.2f}s")
+    percentis = "".join(f"{'p' + str(p) + ' ms':>11}" for p in PERCENTIS)
+    print(f"{'operação':<24}{'qtd':>6}{'op/s':>9}{percentis}{'max ms':>11}")
+    for linha in linhas:
+        print(
+            f"{linha['operacao']:<24}{linha['quantidade']:>6}{linha['vazao']:>9.1f}"
+            + "".join(f"{linha['p' + str(p)]:>11.1f}" for p in PERCENTIS)
+            + f"{linha['max']:>11.1f}"
+        )
+
+
+def carregar_cadastro(juizes=None, semente=0, snapshot=None):
+    """DataFrame preparado: do snapshot local, se indicado, ou sintético com `juizes` linhas"""
+    if snapshot:
+        return carregar_snapshot(fonte_padrao(), SnapshotLocal(snapshot))
+    return preparar_dados(gerar_cadastro(juizes, semente))
+
+
+def _mistura(pares):
+    mistura = {}
+    for par in pares:
+        operacao, _, peso = par.partition("=")
+        mistura[operacao] = float(peso or 1)
+    return mistura
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Teste de carga das buscas de permutas")
+    parser.add_argument("--juizes", type=int, default=5000, help="tamanho do cadastro sintético")
+    parser.add_argument("--snapshot", help="usa o snapshot local em vez do cadastro sintético")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--concorrencia", type=int, nargs="+", default=[1, 8, 32], help="usuários simultâneos")
+    parser.add_argument("--operacoes", type=int, default=400, help="operações por rodada")
+    parser.add_argument("--modo", choices=["threads", "processos", "ambos"], default="threads")
+    parser.add_argument("--mistura", nargs="+", metavar="OPERACAO=PESO", help="ex.: busca_app=6 estatisticas=2")
+    parser.add_argument("--limite", type=int, default=LIMITE_PADRAO, help="resultados por tipo em cada busca")
+    parser.add_argument("--pausa", type=float, default=0.0, help="segundos entre as operações de um usuário")
+    parser.add_argument("--saida", help="grava os resultados em JSON")
+    args = parser.parse_args(argumentos)
+
+    mistura = _mistura(args.mistura) if args.mistura else MISTURA_PADRAO
+    registro = compilar_registro(carregar_cadastro(args.juizes, args.semente, args.snapshot))
+    operacoes = sortear_operacoes(args.operacoes, len(registro), mistura, args.semente)
+    for operacao in sorted(set(mistura)):
+        executar_operacao(registro, operacao, 0, args.limite)  # aquecimento (e validação dos nomes)
+    print(f"📦 {len(registro)} juízes, {args.operacoes} operações por rodada, {os.cpu_count()} CPUs")
+
+    modos = ["threads", "processos"] if args.modo == "ambos" else [args.modo]
+    relatorio = []
+    for modo in modos:
+        for concorrencia in args.concorrencia:
+            por_operacao, duracao = rodada(registro, operacoes, concorrencia, modo, args.limite, args.pausa)
+            linhas = resumir(por_operacao, duracao)
+            imprimir(linhas, concorrencia, modo, duracao)
+            relatorio.append({"modo": modo, "concorrencia": concorrencia, "segundos": duracao, "operacoes": linhas})
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump({"juizes": len(registro), "mistura": mistura, "rodadas": relatorio}, arquivo, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultados em {args.saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
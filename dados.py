@@ -0,0 +1,113 @@
+import hashlib
+import re
+import unicodedata
+import weakref
+
+import pandas as pd
+
+COLUNAS_TRIBUNAL = ["Origem", "Destino 1", "Destino 2", "Destino 3"]
+SEM_TRIBUNAL = -1
+
+# Grafias alternativas -> chave canônica (já normalizadas: sem acento, minúsculas, só letras e números)
+ALIASES_TRIBUNAIS = {
+    "tjdf": "tjdft",
+}
+
+
+def coluna_codigo(coluna):
+    return f"Código {coluna}"
+
+
+def normalizar_tribunal(texto, aliases=None):
+    """Reduz o nome do tribunal a uma chave única: "TJ-SP", "tjsp " e "TJSP" viram "tjsp" """
+    if not isinstance(texto, str):
+        return ""
+    texto_norm = unicodedata.normalize('NFKD', texto)
+    texto_sem_acento = ''.join(c for c in texto_norm if not unicodedata.combining(c))
+    chave = re.sub(r"[^0-9a-z]", "", texto_sem_acento.lower())
+    if aliases is None:
+        aliases = ALIASES_TRIBUNAIS
+    return aliases.get(chave, chave)
+
+
+def codificar_tribunais(df, aliases=None):
+    """
+    Normaliza cada tribunal distinto uma única vez e grava, ao lado das colunas
+    de exibição, colunas "Código ..." com inteiros (SEM_TRIBUNAL quando vazio).
+    A tabela chave -> código fica em df.attrs["codigos_tribunais"].
+    """
+    colunas = [c for c in COLUNAS_TRIBUNAL if c in df.columns]
+    valores = pd.unique(pd.concat([df[c] for c in colunas], ignore_index=True).dropna())
+
+    chave_por_valor = {valor: normalizar_tribunal(valor, aliases) for valor in valores}
+    chaves = sorted({chave for chave in chave_por_valor.values() if chave})
+    codigos = {chave: codigo for codigo, chave in enumerate(chaves)}
+    codigo_por_valor = {valor: codigos.get(chave, SEM_TRIBUNAL) for valor, chave in chave_por_valor.items()}
+
+    df = df.copy()
+    for coluna in colunas:
+        df[coluna_codigo(coluna)] = df[coluna].map(codigo_por_valor).fillna(SEM_TRIBUNAL).astype(int)
+
+    df.attrs["codigos_tribunais"] = codigos
+    df.attrs["aliases_tribunais"] = dict(ALIASES_TRIBUNAIS if aliases is None else aliases)
+    return df
+
+
+def codigo_tribunal(df, texto):
+    """Código do tribunal informado, usando a mesma normalização da carga"""
+    chave = normalizar_tribunal(texto, df.attrs.get("aliases_tribunais"))
+    return df.attrs.get("codigos_tribunais", {}).get(chave, SEM_TRIBUNAL)
+
+
+def nomes_tribunais(df):
+    """Rótulo de exibição de cada código (ex.: 0 -> "TJAC")"""
+    codigos = df.attrs.get("codigos_tribunais", {})
+    return [chave.upper() for chave in sorted(codigos, key=codigos.get)]
+
+
+def possui_codigos(df):
+    return "codigos_tribunais" in df.attrs and all(
+        coluna_codigo(c) in df.columns for c in COLUNAS_TRIBUNAL if c in df.columns
+    )
+
+
+def preparar_dados(df, aliases=None):
+    """Limpeza da planilha bruta e codificação dos tribunais, feita uma vez na carga"""
+    if "Entrância" not in df.columns:
+        df["Entrância"] = None
+
+    for coluna in ["Destino 1", "Destino 2", "Destino 3", "E-mail", "Entrância"]:
+        if coluna in df.columns:
+            df[coluna] = df[coluna].apply(lambda x: str(x).strip() if pd.notnull(x) and str(x).strip() != "" else None)
+
+    df["Nome"] = df["Nome"].str.strip()
+    df["Origem"] = df["Origem"].str.strip()
+
+    # Filtrar apenas registros válidos
+    df = df[df["Nome"].notna() & (df["Nome"] != "") & df["Origem"].notna() & (df["Origem"] != "")]
+
+    df = codificar_tribunais(df, aliases)
+    impressao_digital(df)
+    return df
+
+
+# id(df) -> (referência fraca ao DataFrame, impressão digital); a entrada sai junto com o DataFrame
+_impressoes = {}
+
+
+def impressao_digital(df):
+    """
+    Identificador da versão dos dados: hash do conteúdo das linhas.
+    Calculado uma vez por DataFrame e guardado pela identidade do objeto, não em
+    df.attrs: o pandas copia attrs para filtros e recortes, que passariam a responder
+    com a impressão do DataFrame de origem. O DataFrame não deve ser alterado no
+    lugar depois da carga.
+    """
+    chave = id(df)
+    guardada = _impressoes.get(chave)
+    if guardada is not None and guardada[0]() is df:
+        return guardada[1]
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    digital = hashlib.sha1(hashes.tobytes()).hexdigest()
+    _impressoes[chave] = (weakref.ref(df, lambda _, chave=chave: _impressoes.pop(chave, None)), digital)
+    return digital
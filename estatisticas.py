@@ -0,0 +1,48 @@
+import pandas as pd
+
+from dados import COLUNAS_TRIBUNAL, SEM_TRIBUNAL, codificar_tribunais, coluna_codigo, impressao_digital, nomes_tribunais, possui_codigos
+from instrumentacao import etapa
+
+# Resultados já calculados, por versão dos dados (poucas versões convivem ao mesmo tempo)
+_cache_estatisticas = {}
+_MAXIMO_VERSOES = 8
+
+
+def _contar(df, colunas, tribunais):
+    codigos = pd.concat([df[coluna_codigo(c)] for c in colunas if c in df.columns], ignore_index=True)
+    contagem = codigos[codigos != SEM_TRIBUNAL].value_counts()
+    contagem.index = [tribunais[codigo] for codigo in contagem.index]
+    return contagem
+
+
+def _calcular_estatisticas(df, top):
+    if not possui_codigos(df):
+        df = codificar_tribunais(df)
+    tribunais = nomes_tribunais(df)
+
+    # Tribunais mais procurados
+    procurados = _contar(df, COLUNAS_TRIBUNAL[1:], tribunais)
+    tribunais_procurados = list(procurados.head(top).items())
+
+    # Tribunais mais exportadores
+    tribunais_exportadores = _contar(df, ["Origem"], tribunais).head(top)
+
+    # Tribunais hubs: presença como origem ou como qualquer destino
+    hubs = _contar(df, COLUNAS_TRIBUNAL, tribunais)
+    tribunais_hubs = list(hubs.head(top).items())
+
+    return tribunais_procurados, tribunais_exportadores, tribunais_hubs
+
+
+def calcular_estatisticas(df, top=5):
+    """
+    Calcula estatísticas para os dashboards, com uma contagem por coluna codificada.
+    O resultado fica em memória por versão dos dados (impressão digital do DataFrame).
+    """
+    chave = (impressao_digital(df), top)
+    if chave not in _cache_estatisticas:
+        if len(_cache_estatisticas) >= _MAXIMO_VERSOES:
+            _cache_estatisticas.pop(next(iter(_cache_estatisticas)))
+        with etapa("estatisticas", linhas_lidas=len(df)):
+            _cache_estatisticas[chave] = _calcular_estatisticas(df, top)
+    return _cache_estatisticas[chave]
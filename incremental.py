@@ -0,0 +1,166 @@
+"""
+Manutenção incremental dos ciclos entre versões da planilha.
+
+Uma aresta "A quer ir para onde B está" só depende dos destinos de A e da origem
+de B. Assim, quando poucas linhas mudam, os ciclos formados apenas por juízes
+inalterados continuam válidos: basta descartar os ciclos que passam por juízes
+alterados ou removidos e buscar, a partir de cada juiz novo ou alterado, os
+ciclos que passam por ele.
+
+Com PERMUTA_NOVIDADES=1, o serviço (servico.py) mantém um MatcherIncremental, atualizado
+em segundo plano a cada nova versão do snapshot; as novidades desde uma versão saem em
+GET /novidades?desde=<versão>.
+"""
+from itertools import islice
+
+import pandas as pd
+
+from algoritmo import IndicePermutas, Orcamento, chave_canonica, enumerar_ciclos, enumerar_ciclos_do_juiz, montar_ciclo
+from instrumentacao import contar, etapa
+
+
+def comparar_versoes(anterior, atual):
+    """
+    Diferença linha a linha entre dois DataFrames indexados pela chave do juiz,
+    no mesmo formato do resumo de sincronizacao.sincronizar.
+    """
+    colunas = [c for c in atual.columns if not c.startswith("Código ")]
+    hash_anterior = pd.util.hash_pandas_object(anterior[colunas], index=False)
+    hash_atual = pd.util.hash_pandas_object(atual[colunas], index=False)
+    hash_anterior.index = anterior.index
+    hash_atual.index = atual.index
+
+    comuns = hash_atual.index.intersection(hash_anterior.index)
+    return {
+        "adicionadas": [c for c in hash_atual.index if c not in hash_anterior.index],
+        "alteradas": [c for c in comuns if hash_atual[c] != hash_anterior[c]],
+        "removidas": [c for c in hash_anterior.index if c not in hash_atual.index],
+    }
+
+
+class MatcherIncremental:
+    """
+    Mantém o conjunto atual de ciclos (até max_len juízes) ao longo das versões dos dados.
+    Os ciclos são guardados pelas chaves dos juízes (índice do DataFrame), na forma
+    canônica, junto com a versão em que apareceram.
+    Com `tempo_limite` (s), a enumeração inicial e cada atualização param no prazo, e
+    com `maximo_ciclos` a inicial para nesse número de ciclos; `completo` fica False.
+    A enumeração inicial incompleta só deixa de fora ciclos antigos (de ciclos_do_juiz
+    e removidos_desde): um ciclo novo sempre passa por um juiz novo ou alterado, e
+    estes são buscados a cada atualizar().
+    `versao_minima` é a versão mais antiga a que as novidades ainda respondem: a inicial,
+    ou a última passada a podar().
+    """
+
+    def __init__(self, df, max_len=4, tempo_limite=None, maximo_ciclos=None):
+        self.max_len = max_len
+        self.tempo_limite = tempo_limite
+        self.tamanhos = range(2, max_len + 1)
+        self.versao = df.attrs.get("versao", 0)
+        self.versao_minima = self.versao
+        self.ciclos = {}
+        self.por_juiz = {}
+        self.removidos = []
+
+        self._indexar(df)
+        orcamento = Orcamento(tempo_limite, maximo_ciclos)
+        with etapa("matcher_inicial"):
+            for ciclo in enumerar_ciclos(self.indice, self.tamanhos, orcamento):
+                self._adicionar(self._em_chaves(ciclo))
+                orcamento.registrar()
+                if orcamento.esgotado:
+                    break
+            contar("ciclos_encontrados", len(self.ciclos))
+        self.completo = not orcamento.esgotado
+
+    def _indexar(self, df):
+        self.df = df
+        self.indice = IndicePermutas(df)
+        self.posicoes = {chave: posicao for posicao, chave in enumerate(self.indice.chaves)}
+
+    def _em_chaves(self, ciclo):
+        return chave_canonica(tuple(self.indice.chaves[posicao] for posicao in ciclo))
+
+    def _adicionar(self, ciclo):
+        self.ciclos[ciclo] = self.versao
+        for juiz in ciclo:
+            self.por_juiz.setdefault(juiz, set()).add(ciclo)
+
+    def _remover(self, ciclo):
+        del self.ciclos[ciclo]
+        for juiz in ciclo:
+            self.por_juiz[juiz].discard(ciclo)
+        self.removidos.append((self.versao, ciclo))
+
+    def atualizar(self, df, alteracoes=None):
+        """
+        Aplica uma nova versão dos dados. `alteracoes` é o resumo de sincronizar (ou de
+        comparar_versoes); sem ele, a diferença é calculada contra a versão anterior.
+        Devolve {"versao", "novos", "removidos", "completo"} com os ciclos (em chaves)
+        desta versão; completo é False se o prazo acabou antes de todos os juízes alterados.
+        """
+        if alteracoes is None:
+            alteracoes = comparar_versoes(self.df, df)
+        self.versao = df.attrs.get("versao", self.versao + 1)
+
+        removidos = []
+        for juiz in set(alteracoes["alteradas"]) | set(alteracoes["removidas"]):
+            for ciclo in list(self.por_juiz.get(juiz, ())):
+                self._remover(ciclo)
+                removidos.append(ciclo)
+        for juiz in alteracoes["removidas"]:
+            self.por_juiz.pop(juiz, None)
+
+        self._indexar(df)
+        novos = []
+        orcamento = Orcamento(self.tempo_limite)
+        with etapa("atualizacao_incremental", ciclos_removidos=len(removidos)):
+            for juiz in set(alteracoes["adicionadas"]) | set(alteracoes["alteradas"]):
+                if orcamento.esgotado:
+                    break
+                if juiz not in self.posicoes:
+                    continue
+                for ciclo in enumerar_ciclos_do_juiz(self.indice, self.posicoes[juiz], self.tamanhos, orcamento):
+                    ciclo = self._em_chaves(ciclo)
+                    if ciclo not in self.ciclos:
+                        self._adicionar(ciclo)
+                        novos.append(ciclo)
+                    else:
+                        # Ciclo com dois juízes alterados: já encontrado a partir do outro
+                        contar("duplicados_descartados")
+            contar("ciclos_encontrados", len(novos))
+
+        self.completo = self.completo and not orcamento.esgotado
+        return {"versao": self.versao, "novos": novos, "removidos": removidos, "completo": not orcamento.esgotado}
+
+    def montar(self, ciclo):
+        """Dicionário de exibição (como em buscar_ciclos) de um ciclo guardado em chaves"""
+        return montar_ciclo(self.indice, tuple(self.posicoes[juiz] for juiz in ciclo))
+
+    def novos_desde(self, versao, juiz=None, limite=None):
+        """Até `limite` ciclos que surgiram depois da versão `versao` e ainda são válidos (só os do `juiz`, se dado)"""
+        ciclos = self.ciclos if juiz is None else self.por_juiz.get(juiz, ())
+        novos = (ciclo for ciclo in ciclos if self.ciclos[ciclo] > versao)
+        return [self.montar(ciclo) for ciclo in islice(novos, limite)]
+
+    def removidos_desde(self, versao, juiz=None, limite=None):
+        """Até `limite` ciclos (em chaves) que deixaram de existir depois da versão `versao`"""
+        removidos = (
+            ciclo for removido, ciclo in self.removidos
+            if removido > versao and ciclo not in self.ciclos and (juiz is None or juiz in ciclo)
+        )
+        return list(islice(removidos, limite))
+
+    def podar(self, versao):
+        """Esquece as remoções até a versão `versao`: novidades só desde ela em diante"""
+        if versao > self.versao_minima:
+            self.versao_minima = versao
+            self.removidos = [(removido, ciclo) for removido, ciclo in self.removidos if removido > versao]
+
+    def ciclos_do_juiz(self, chave):
+        """Ciclos atuais que passam pelo juiz, começando por ele"""
+        resultado = []
+        for ciclo in self.por_juiz.get(chave, ()):
+            inicio = ciclo.index(chave)
+            resultado.append(self.montar(ciclo[inicio:] + ciclo[:inicio]))
+        return resultado
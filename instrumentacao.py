@@ -0,0 +1,101 @@
+"""
+Instrumentação leve: cronômetro por etapa e contadores.
+
+Cada etapa (carga, estatísticas, busca, montagem das tabelas...) é medida com
+`with etapa("nome"):` e pode acumular contadores com contar(): linhas lidas,
+arestas percorridas, ciclos encontrados, duplicados descartados. Ao terminar,
+a etapa vai para o log "permuta" como uma linha JSON e, se houver uma medição
+ativa (iniciar_medicao), para a tabela da execução atual, exibida no painel
+de desempenho do app. A medição vale por thread (cada sessão do Streamlit roda
+o script na sua), então sessões simultâneas não se misturam.
+"""
+import json
+import logging
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+logger = logging.getLogger("permuta")
+# Painel de desempenho sempre visível no app (também pode ser aberto com ?debug=1 na URL)
+PAINEL_DESEMPENHO = os.environ.get("PERMUTA_DEBUG") == "1"
+
+_medicao = ContextVar("medicao", default=None)
+_etapas_abertas = ContextVar("etapas_abertas", default=())
+
+
+class Medicao:
+    """Etapas medidas durante uma execução (do script do app, de um relatório...)"""
+
+    def __init__(self):
+        self.inicio = perf_counter()
+        self.etapas = []
+
+    def tabela(self):
+        """Uma linha por etapa, na ordem em que começaram, com o tempo e os contadores"""
+        linhas = []
+        for registro in self.etapas:
+            recuo = "  " * (registro["nivel"] - 1) + "↳ " if registro["nivel"] else ""
+            linha = {"Etapa": recuo + registro["etapa"], "Tempo (ms)": registro["ms"]}
+            linha.update(registro["contadores"])
+            linhas.append(linha)
+        return linhas
+
+    def total_ms(self):
+        return round((perf_counter() - self.inicio) * 1000, 1)
+
+
+def configurar_log():
+    """Liga o log das etapas no nível de PERMUTA_LOG (ex.: INFO), se definido"""
+    nivel = os.environ.get("PERMUTA_LOG")
+    if nivel:
+        logging.basicConfig(format="%(asctime)s %(name)s %(message)s")
+        logger.setLevel(nivel.upper())
+
+
+def iniciar_medicao():
+    """Começa a coletar as etapas da thread atual (substitui a medição anterior)"""
+    medicao = Medicao()
+    _medicao.set(medicao)
+    return medicao
+
+
+def parar_medicao():
+    """Descarta a medição da thread atual: as etapas seguem só para o log"""
+    _medicao.set(None)
+
+
+def medicao_atual():
+    return _medicao.get()
+
+
+def medindo():
+    """Há uma medição ativa: vale a pena pagar por contadores finos (ex.: arestas)"""
+    return _medicao.get() is not None
+
+
+@contextmanager
+def etapa(nome, **contadores):
+    """Mede o bloco; os contadores passados aqui e os acumulados com contar() saem no registro"""
+    abertas = _etapas_abertas.get()
+    registro = {"etapa": nome, "nivel": len(abertas), "ms": None, "contadores": dict(contadores)}
+    medicao = _medicao.get()
+    if medicao is not None:
+        medicao.etapas.append(registro)
+    token = _etapas_abertas.set(abertas + (registro,))
+    inicio = perf_counter()
+    try:
+        yield registro
+    finally:
+        registro["ms"] = round((perf_counter() - inicio) * 1000, 1)
+        _etapas_abertas.reset(token)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({"etapa": nome, "ms": registro["ms"], **registro["contadores"]}, ensure_ascii=False))
+
+
+def contar(contador, quantidade=1):
+    """Soma `quantidade` ao contador da etapa mais interna em andamento (sem etapa, nada acontece)"""
+    abertas = _etapas_abertas.get()
+    if abertas:
+        contadores = abertas[-1]["contadores"]
+        contadores[contador] = contadores.get(contador, 0) + quantidade
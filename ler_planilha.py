@@ -1,37 +1,31 @@
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+import json
+
 import pandas as pd
 
-# Etapa 1: Autenticar e acessar planilha
-escopos = [
-    "https://spreadsheets.google.com/feeds",
-    "https://www.googleapis.com/auth/drive"
-]
+from dados import preparar_dados
+from sincronizacao import FontePlanilhaGoogle
+
 
-credenciais = ServiceAccountCredentials.from_json_keyfile_name(
-    "credenciais.json",
-    escopos
-)
+def ler_credenciais(caminho="credenciais.json"):
+    """Credenciais da conta de serviço do Google (arquivo JSON baixado do console)"""
+    with open(caminho, encoding="utf-8") as arquivo:
+        return json.load(arquivo)
 
-cliente = gspread.authorize(credenciais)
-planilha = cliente.open("Permuta - Magistratura Estadual")
-aba = planilha.sheet1
 
-# Etapa 2: Obter e transformar dados em DataFrame
-dados = aba.get_all_values()
-colunas = dados[0]
-linhas = dados[1:]
+def ler_planilha(caminho_credenciais="credenciais.json"):
+    """Planilha inteira, já limpa e com os tribunais codificados, fora do Streamlit"""
+    # Etapa 1: Autenticar e acessar planilha
+    fonte = FontePlanilhaGoogle(ler_credenciais(caminho_credenciais))
 
-df = pd.DataFrame(linhas, columns=colunas)
+    # Etapa 2: Obter e transformar dados em DataFrame
+    colunas, linhas = fonte.ler_linhas()
+    df = pd.DataFrame(linhas, columns=colunas)
 
-# Etapa 3: Padronizar valores vazios → None
-for coluna in ["Destino 1", "Destino 2", "Destino 3"]:
-    df[coluna] = df[coluna].apply(lambda x: x.strip() if x.strip() != "" else None)
+    # Etapa 3: Padronizar valores vazios → None e limpar espaços extras
+    return preparar_dados(df)
 
-# Também podemos limpar espaços extras em todas as colunas
-df["Nome"] = df["Nome"].str.strip()
-df["Origem"] = df["Origem"].str.strip()
 
-# Ver resultado
-print("🔍 Dados tratados:")
-print(df)
+if __name__ == "__main__":
+    # Ver resultado
+    print("🔍 Dados tratados:")
+    print(ler_planilha())
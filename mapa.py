@@ -1,5 +1,12 @@
+import hashlib
+from collections import Counter
+from functools import lru_cache
+
 import plotly.graph_objects as go
 
+from algoritmo import LETRAS
+from dados import normalizar_tribunal
+
 # Dicionário de coordenadas (latitude, longitude) para todos os TJs do Brasil
 coordenadas_tj = {
     "TJAC": [-9.97499, -67.8243],
@@ -31,70 +38,150 @@ coordenadas_tj = {
     "TJTO": [-10.1841, -48.3336]
 }
 
-def mostrar_mapa_casais(casais):
-    fig = go.Figure()
+# Rotas agregadas são desenhadas em poucas faixas de espessura (uma trace por faixa)
+FAIXAS_ESPESSURA = 4
+_cache_figuras = {}
+_MAXIMO_FIGURAS = 16
 
-    for c in casais:
-        coords = []
-        for tj in [c["Origem A"], c["Destino A"]]:
-            if tj in coordenadas_tj:
-                coords.append(coordenadas_tj[tj])
+LAYOUT_GEO = dict(
+    scope='south america',
+    projection_type='mercator',
+    showland=True,
+    landcolor='rgb(243, 243, 243)',
+    countrycolor='rgb(204, 204, 204)'
+)
 
-        if len(coords) == 2:
-            lats = [c[0] for c in coords]
-            lons = [c[1] for c in coords]
-            fig.add_trace(go.Scattergeo(
-                lon=lons,
-                lat=lats,
-                mode='lines+markers',
-                line=dict(width=2, color='green'),
-                marker=dict(size=6, color='blue'),
-                name=f"{c['Juiz A']} ↔ {c['Juiz B']}"
-            ))
 
-    fig.update_layout(
-        title="🔁 Permutas Diretas entre Juízes no Mapa do Brasil",
-        geo=dict(
-            scope='south america',
-            projection_type='mercator',
-            showland=True,
-            landcolor='rgb(243, 243, 243)',
-            countrycolor='rgb(204, 204, 204)'
-        )
-    )
-    return fig
+@lru_cache(maxsize=1024)
+def _tribunal(texto):
+    """Chave de coordenadas_tj para a grafia informada ("TJ-SP", "tjsp " -> "TJSP")"""
+    chave = normalizar_tribunal(texto).upper()
+    return chave if chave in coordenadas_tj else None
 
 
-def mostrar_mapa_triangulacoes(triangulos):
-    fig = go.Figure()
+def contar_rotas(ciclos):
+    """
+    (TJ de saída, TJ de chegada) -> quantidade de movimentos, somando todos os ciclos.
+    Cada participante sai da própria origem para a origem do seguinte; serve para casais
+    e para ciclos de qualquer tamanho (dicionários de montar_casal / montar_ciclo).
+    """
+    rotas = Counter()
+    # As colunas "Origem X" só mudam quando muda o formato do dicionário
+    colunas, tamanho_dicionario = [], None
+    for ciclo in ciclos:
+        if len(ciclo) != tamanho_dicionario:
+            colunas = [f"Origem {letra}" for letra in LETRAS if f"Origem {letra}" in ciclo]
+            tamanho_dicionario = len(ciclo)
+        tribunais = [_tribunal(ciclo[coluna]) for coluna in colunas]
+        if len(tribunais) < 2 or None in tribunais:
+            continue
+        for atual, proximo in zip(tribunais, tribunais[1:] + tribunais[:1]):
+            if atual != proximo:
+                rotas[(atual, proximo)] += 1
+    return rotas
+
+
+def _segmentos(pares):
+    """Coordenadas de vários segmentos em uma única linha, separados por None"""
+    lats, lons = [], []
+    for de, para in pares:
+        lats += [coordenadas_tj[de][0], coordenadas_tj[para][0], None]
+        lons += [coordenadas_tj[de][1], coordenadas_tj[para][1], None]
+    return lats, lons
 
-    for t in triangulos:
-        coords = []
-        # Vamos considerar ORIGEM dos juízes para fechar o triângulo corretamente
-        for tj in [t["Origem A"], t["Origem B"], t["Origem C"], t["Origem A"]]:
-            if tj in coordenadas_tj:
-                coords.append(coordenadas_tj[tj])
 
-        if len(coords) == 4:
-            lats = [c[0] for c in coords]
-            lons = [c[1] for c in coords]
+def _figura(rotas, titulo, cor, agregar):
+    fig = go.Figure()
+
+    if agregar:
+        # Ida e volta entre os mesmos tribunais viram um único trecho, com espessura pela quantidade
+        trechos = Counter()
+        for (de, para), quantidade in rotas.items():
+            trechos[tuple(sorted((de, para)))] += quantidade
+        maior = max(trechos.values(), default=1)
+        faixas = {}
+        for trecho, quantidade in trechos.items():
+            faixas.setdefault((quantidade * FAIXAS_ESPESSURA - 1) // maior, []).append(trecho)
+        for faixa in sorted(faixas):
+            lats, lons = _segmentos(faixas[faixa])
             fig.add_trace(go.Scattergeo(
                 lon=lons,
                 lat=lats,
-                mode='lines+markers',
-                line=dict(width=2, color='blue'),
-                marker=dict(size=6, color='red'),
-                name=f"{t['Juiz A']} ➝ {t['Juiz B']} ➝ {t['Juiz C']}"
+                mode='lines',
+                line=dict(width=1.5 * (faixa + 1), color=cor),
+                opacity=0.4 + 0.6 * (faixa + 1) / FAIXAS_ESPESSURA,
+                hoverinfo='skip',
+                showlegend=False
             ))
+        # Ponto invisível no meio de cada trecho, só para o texto ao passar o mouse
+        fig.add_trace(go.Scattergeo(
+            lon=[(coordenadas_tj[a][1] + coordenadas_tj[b][1]) / 2 for a, b in trechos],
+            lat=[(coordenadas_tj[a][0] + coordenadas_tj[b][0]) / 2 for a, b in trechos],
+            mode='markers',
+            marker=dict(size=8, color=cor, opacity=0.05),
+            hovertext=[
+                f"{a} → {b}: {rotas.get((a, b), 0)} | {b} → {a}: {rotas.get((b, a), 0)}" for a, b in trechos
+            ],
+            hoverinfo='text',
+            showlegend=False
+        ))
+    else:
+        lats, lons = _segmentos(rotas)
+        fig.add_trace(go.Scattergeo(
+            lon=lons,
+            lat=lats,
+            mode='lines',
+            line=dict(width=2, color=cor),
+            hoverinfo='skip',
+            showlegend=False
+        ))
+
+    movimentos = Counter()
+    for (de, para), quantidade in rotas.items():
+        movimentos[de] += quantidade
+        movimentos[para] += quantidade
+    maior = max(movimentos.values(), default=1)
+    fig.add_trace(go.Scattergeo(
+        lon=[coordenadas_tj[tj][1] for tj in movimentos],
+        lat=[coordenadas_tj[tj][0] for tj in movimentos],
+        mode='markers+text',
+        marker=dict(size=[6 + 14 * q / maior for q in movimentos.values()], color='red'),
+        text=list(movimentos),
+        textposition='top center',
+        hovertext=[f"{tj}: {q} movimento(s)" for tj, q in movimentos.items()],
+        hoverinfo='text',
+        showlegend=False
+    ))
 
-    fig.update_layout(
-        title="🔺 Triangulações entre Juízes no Mapa do Brasil",
-        geo=dict(
-            scope='south america',
-            projection_type='mercator',
-            showland=True,
-            landcolor='rgb(243, 243, 243)',
-            countrycolor='rgb(204, 204, 204)'
-        )
-    )
+    fig.update_layout(title=titulo, geo=LAYOUT_GEO)
     return fig
+
+
+def mostrar_mapa_ciclos(ciclos, titulo="🔄 Ciclos de Permuta no Mapa do Brasil", cor='blue', agregar=True):
+    """
+    Mapa de qualquer lista de casais ou ciclos com um número fixo de traces, seja qual
+    for a quantidade de resultados:
+    - agregar=True: rotas iguais somadas, com espessura e texto pela quantidade;
+    - agregar=False: todas as rotas em uma única linha (separadas por None).
+    A figura fica em memória pelas rotas do resultado: o mesmo resultado não é redesenhado.
+    """
+    rotas = contar_rotas(ciclos)
+    chave = hashlib.sha1(repr((titulo, cor, agregar, sorted(rotas.items()))).encode("utf-8")).hexdigest()
+    if chave not in _cache_figuras:
+        if len(_cache_figuras) >= _MAXIMO_FIGURAS:
+            _cache_figuras.pop(next(iter(_cache_figuras)))
+        _cache_figuras[chave] = _figura(rotas, titulo, cor, agregar)
+    return _cache_figuras[chave]
+
+
+def mostrar_mapa_casais(casais, agregar=True):
+    return mostrar_mapa_ciclos(casais, "🔁 Permutas Diretas entre Juízes no Mapa do Brasil", 'green', agregar)
+
+
+def mostrar_mapa_triangulacoes(triangulos, agregar=True):
+    # Considera a ORIGEM dos juízes para fechar o triângulo corretamente
+    return mostrar_mapa_ciclos(triangulos, "🔺 Triangulações entre Juízes no Mapa do Brasil", 'blue', agregar)
+
+
+def mostrar_mapa_quadrangulacoes(quadrangulos, agregar=True):
+    return mostrar_mapa_ciclos(quadrangulos, "🔷 Quadrangulações entre Juízes no Mapa do Brasil", 'purple', agregar)
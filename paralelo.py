@@ -0,0 +1,156 @@
+"""
+Busca de ciclos em paralelo, para a base inteira (quadrangulações e maiores).
+
+A enumeração canônica atribui cada ciclo ao seu menor id, então os juízes de
+partida podem ser repartidos entre processos sem que dois deles encontrem o
+mesmo ciclo. O grafo compacto vai para cada processo uma única vez (no
+inicializador do pool) e cada tarefa recebe só a sua fatia de partidas.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from heapq import merge
+from time import perf_counter, time
+
+from algoritmo import IndicePermutas, Orcamento, _melhores, enumerar_ciclos, montar_ciclo
+from instrumentacao import contar, etapa
+
+# Abaixo disso o custo de subir os processos supera o ganho
+MINIMO_PARALELO = 500
+# Fatias por processo: partidas baixas têm mais trabalho (sucessores > partida),
+# então fatias intercaladas e numerosas equilibram a carga
+FATIAS_POR_TRABALHADOR = 8
+
+_grafo = None
+
+
+def numero_trabalhadores(trabalhadores=None):
+    """Quantidade de processos: o valor pedido, PERMUTA_TRABALHADORES ou o número de CPUs"""
+    if trabalhadores is None:
+        trabalhadores = int(os.environ.get("PERMUTA_TRABALHADORES", 0)) or os.cpu_count() or 1
+    return max(1, trabalhadores)
+
+
+def _inicializar(grafo):
+    global _grafo
+    _grafo = grafo
+
+
+def _enumerar_fatia(inicios, tamanhos, prazo):
+    """Executado no processo filho: ciclos que começam nas partidas da fatia"""
+    orcamento = Orcamento(max(0.0, prazo - time()) if prazo is not None else None)
+    ciclos = list(enumerar_ciclos(_grafo, tamanhos, orcamento, inicios=inicios))
+    return ciclos, orcamento.esgotado
+
+
+def enumerar_ciclos_paralelo(indice, tamanhos, trabalhadores=None, tempo_limite=None):
+    """
+    Mesmo resultado (e mesma ordem) de enumerar_ciclos, repartindo as partidas entre
+    `trabalhadores` processos. Devolve (ciclos, completo).
+    Sem ganho possível (um só trabalhador, base pequena) ou se o pool não puder ser
+    criado, a busca roda em série no próprio processo.
+    """
+    tamanhos = set(tamanhos)
+    trabalhadores = numero_trabalhadores(trabalhadores)
+    if trabalhadores > 1 and len(indice) >= MINIMO_PARALELO:
+        try:
+            return _enumerar_em_processos(indice, tamanhos, trabalhadores, tempo_limite)
+        except (OSError, NotImplementedError, BrokenProcessPool):
+            pass
+
+    orcamento = Orcamento(tempo_limite)
+    ciclos = list(enumerar_ciclos(indice, tamanhos, orcamento))
+    return ciclos, not orcamento.esgotado
+
+
+def _enumerar_em_processos(indice, tamanhos, trabalhadores, tempo_limite):
+    prazo = time() + tempo_limite if tempo_limite is not None else None
+    total = min(len(indice), trabalhadores * FATIAS_POR_TRABALHADOR)
+    fatias = [range(inicio, len(indice), total) for inicio in range(total)]
+
+    with etapa("busca_paralela", trabalhadores=trabalhadores, fatias=total):
+        with ProcessPoolExecutor(trabalhadores, initializer=_inicializar, initargs=(indice.compacto(),)) as pool:
+            tarefas = [pool.submit(_enumerar_fatia, fatia, tamanhos, prazo) for fatia in fatias]
+            parciais = [tarefa.result() for tarefa in tarefas]
+
+        # Cada fatia sai em ordem lexicográfica; a intercalação reconstrói a ordem da busca em série
+        ciclos = []
+        for ciclo in merge(*(lista for lista, _ in parciais)):
+            if not ciclos or ciclo != ciclos[-1]:
+                ciclos.append(ciclo)
+            else:
+                contar("duplicados_descartados")
+        contar("ciclos_encontrados", len(ciclos))
+    return ciclos, not any(esgotado for _, esgotado in parciais)
+
+
+def _melhores_das_raizes(indice, raizes, k, tamanhos, prazo):
+    """{raiz: {tamanho: [ciclos]}} das raízes que couberam no prazo (as demais ficam de fora)"""
+    orcamento = Orcamento(max(0.0, prazo - time()) if prazo is not None else None)
+    resultados = {}
+    for raiz in raizes:
+        if prazo is not None and time() > prazo:
+            break
+        melhores = _melhores(indice, k, tamanhos, raiz, orcamento, por_tamanho=True)
+        if orcamento.esgotado:
+            break
+        resultados[raiz] = melhores
+    return resultados
+
+
+def _melhores_da_fatia(raizes, k, tamanhos, prazo):
+    """Executado no processo filho: os k melhores de cada juiz da fatia"""
+    return _melhores_das_raizes(_grafo, raizes, k, tamanhos, prazo)
+
+
+def melhores_por_juiz(indice, k, tamanhos, trabalhadores=None, tempo_limite=None):
+    """
+    Os k ciclos mais baratos de cada tamanho para cada juiz: uma busca enraizada com
+    poda (_melhores) por juiz, com os juízes repartidos entre processos.
+    Devolve {posição: {tamanho: [ciclos começando pelo juiz]}}; juízes que não
+    couberam em `tempo_limite` ficam de fora.
+    """
+    tamanhos = set(tamanhos)
+    prazo = time() + tempo_limite if tempo_limite is not None else None
+    trabalhadores = numero_trabalhadores(trabalhadores)
+    if trabalhadores > 1 and len(indice) >= MINIMO_PARALELO:
+        total = min(len(indice), trabalhadores * FATIAS_POR_TRABALHADOR)
+        fatias = [range(inicio, len(indice), total) for inicio in range(total)]
+        try:
+            with etapa("melhores_paralelo", trabalhadores=trabalhadores, fatias=total):
+                with ProcessPoolExecutor(trabalhadores, initializer=_inicializar, initargs=(indice.compacto(),)) as pool:
+                    tarefas = [pool.submit(_melhores_da_fatia, fatia, k, tamanhos, prazo) for fatia in fatias]
+                    resultados = {}
+                    for tarefa in tarefas:
+                        resultados.update(tarefa.result())
+                return resultados
+        except (OSError, NotImplementedError, BrokenProcessPool):
+            pass
+    return _melhores_das_raizes(indice, range(len(indice)), k, tamanhos, prazo)
+
+
+def buscar_ciclos_paralelo(df, max_len=4, min_len=2, trabalhadores=None, tempo_limite=None, indice=None,
+                           montar=True):
+    """
+    Versão paralela de buscar_ciclos para a base inteira, com o mesmo formato de retorno:
+    {"ciclos", "contagens", "completo", "tempo"}.
+    """
+    if min_len < 2 or max_len < min_len:
+        raise ValueError("É preciso 2 <= min_len <= max_len")
+    if indice is None:
+        indice = IndicePermutas(df)
+
+    inicio = perf_counter()
+    tamanhos = range(min_len, max_len + 1)
+    encontrados, completo = enumerar_ciclos_paralelo(indice, tamanhos, trabalhadores, tempo_limite)
+
+    ciclos = {tamanho: [] for tamanho in tamanhos}
+    for ciclo in encontrados:
+        ciclos[len(ciclo)].append(montar_ciclo(indice, ciclo) if montar else ciclo)
+
+    return {
+        "ciclos": ciclos,
+        "contagens": {tamanho: len(lista) for tamanho, lista in ciclos.items()},
+        "completo": completo,
+        "tempo": perf_counter() - inicio,
+    }
@@ -0,0 +1,321 @@
+"""
+Planejador global de permutas.
+
+Responde à pergunta da administração: qual conjunto de casais, triangulações e
+quadrangulações, sem juízes em comum, movimenta mais juízes, ponderado pela
+prioridade (Destino 1/2/3) de cada movimento. É o mesmo problema do "kidney
+exchange": empacotamento de ciclos disjuntos de peso máximo.
+"""
+from heapq import heapify, heappop, heappush
+from time import perf_counter
+
+from algoritmo import IndicePermutas, Orcamento, enumerar_ciclos, montar_ciclo
+
+# Peso de cada movimento conforme a prioridade do destino obtido
+PESO_PRIORIDADE = {1: 3, 2: 2, 3: 1}
+
+
+def peso_ciclo(indice, ciclo):
+    """Soma dos pesos dos movimentos do ciclo"""
+    return sum(
+        PESO_PRIORIDADE.get(indice.prioridade(atual, ciclo[(posicao + 1) % len(ciclo)]), 0)
+        for posicao, atual in enumerate(ciclo)
+    )
+
+
+def _componentes(ciclos):
+    """Agrupa os ciclos que compartilham juízes (union-find sobre os juízes)"""
+    pai = {}
+
+    def raiz(juiz):
+        while pai[juiz] != juiz:
+            pai[juiz] = pai[pai[juiz]]
+            juiz = pai[juiz]
+        return juiz
+
+    for ciclo in ciclos:
+        for juiz in ciclo:
+            pai.setdefault(juiz, juiz)
+        primeiro = raiz(ciclo[0])
+        for juiz in ciclo[1:]:
+            pai[raiz(juiz)] = primeiro
+
+    grupos = {}
+    for posicao, ciclo in enumerate(ciclos):
+        grupos.setdefault(raiz(ciclo[0]), []).append(posicao)
+    return list(grupos.values())
+
+
+def _guloso(ciclos, pesos, candidatos):
+    """Escolhe os ciclos de maior peso (os menores primeiro no empate) que ainda cabem"""
+    ocupados = set()
+    escolhidos = []
+    for c in sorted(candidatos, key=lambda c: (-pesos[c], len(ciclos[c]))):
+        if ocupados.isdisjoint(ciclos[c]):
+            ocupados.update(ciclos[c])
+            escolhidos.append(c)
+    return escolhidos
+
+
+def _busca_local(ciclos, pesos, candidatos, escolhidos, prazo):
+    """
+    Melhora a solução trocando ciclos escolhidos por um ciclo fora dela quando o
+    ganho é positivo e reaproveitando, de forma gulosa, os juízes liberados.
+    """
+    por_juiz = {}
+    for c in candidatos:
+        for juiz in ciclos[c]:
+            por_juiz.setdefault(juiz, []).append(c)
+
+    dono = {juiz: c for c in escolhidos for juiz in ciclos[c]}
+    melhorou = True
+    while melhorou and perf_counter() < prazo:
+        melhorou = False
+        for c in candidatos:
+            if perf_counter() >= prazo:
+                break
+            conflitos = {dono[juiz] for juiz in ciclos[c] if juiz in dono}
+            if c in conflitos or pesos[c] <= sum(pesos[x] for x in conflitos):
+                continue
+
+            liberados = set()
+            for x in conflitos:
+                for juiz in ciclos[x]:
+                    del dono[juiz]
+                liberados.update(ciclos[x])
+            for juiz in ciclos[c]:
+                dono[juiz] = c
+            liberados.difference_update(ciclos[c])
+
+            vizinhos = {v for juiz in liberados for v in por_juiz[juiz]}
+            for v in sorted(vizinhos, key=lambda v: (-pesos[v], len(ciclos[v]))):
+                if all(juiz not in dono for juiz in ciclos[v]):
+                    for juiz in ciclos[v]:
+                        dono[juiz] = v
+            melhorou = True
+
+    return list(dict.fromkeys(dono.values()))
+
+
+def _exato(ciclos, pesos, candidatos, inicial, prazo):
+    """
+    Branch-and-bound sobre os ciclos do componente, partindo da solução `inicial`.
+    O limite superior é o menor entre a soma dos pesos restantes e, para cada juiz
+    ainda livre, o melhor peso por participante dos ciclos que o contêm.
+    Devolve (escolhidos, otimo); otimo é False se o prazo acabou antes do fim.
+    """
+    ordem = sorted(candidatos, key=lambda c: -pesos[c])
+    restante = [0] * (len(ordem) + 1)
+    for i in range(len(ordem) - 1, -1, -1):
+        restante[i] = restante[i + 1] + pesos[ordem[i]]
+
+    por_participante = {}
+    for c in ordem:
+        razao = pesos[c] / len(ciclos[c])
+        for juiz in ciclos[c]:
+            por_participante[juiz] = max(por_participante.get(juiz, 0), razao)
+
+    melhor = {"peso": sum(pesos[c] for c in inicial), "escolhidos": list(inicial)}
+    estado = {"interrompido": False, "passos": 0}
+    ocupados = set()
+    escolhidos = []
+
+    def explorar(i, total, livre):
+        # O ramo "fica de fora" segue no laço; só a inclusão aprofunda a recursão
+        if total > melhor["peso"]:
+            melhor["peso"] = total
+            melhor["escolhidos"] = list(escolhidos)
+        while i < len(ordem):
+            estado["passos"] += 1
+            if estado["passos"] % 1024 == 0 and perf_counter() > prazo:
+                estado["interrompido"] = True
+            if estado["interrompido"] or total + min(restante[i], livre) <= melhor["peso"]:
+                return
+
+            c = ordem[i]
+            if ocupados.isdisjoint(ciclos[c]):
+                ocupados.update(ciclos[c])
+                escolhidos.append(c)
+                explorar(i + 1, total + pesos[c], livre - sum(por_participante[j] for j in ciclos[c]))
+                escolhidos.pop()
+                ocupados.difference_update(ciclos[c])
+            i += 1
+
+    explorar(0, 0, sum(por_participante.values()))
+    return melhor["escolhidos"], not estado["interrompido"]
+
+
+def _ciclos_de_tribunais(indice, max_len):
+    """Ciclos simples do grafo de tribunais (X -> Y se alguém lotado em X quer Y), na forma canônica"""
+    vizinhos = {}
+    for tribunal, juizes in indice.por_origem.items():
+        vizinhos[tribunal] = sorted({d for j in juizes for d in indice.destinos[j] if d != tribunal and d in indice.por_origem})
+
+    ciclos = []
+    caminho = []
+
+    def estender():
+        atual = caminho[-1]
+        for proximo in vizinhos[atual]:
+            if proximo == caminho[0] and len(caminho) > 1:
+                ciclos.append(tuple(caminho))
+            elif proximo > caminho[0] and proximo not in caminho and len(caminho) < max_len:
+                caminho.append(proximo)
+                estender()
+                caminho.pop()
+
+    for tribunal in sorted(vizinhos):
+        caminho.append(tribunal)
+        estender()
+        caminho.pop()
+    return ciclos
+
+
+def _guloso_por_tribunal(indice, max_len, prazo):
+    """
+    Guloso sobre o grafo de tribunais, que escala para milhares de juízes: cada ciclo
+    de tribunais é preenchido com os juízes livres de melhor prioridade em cada trecho.
+    O peso de um ciclo só cai à medida que juízes são usados, então uma fila de
+    prioridade com reavaliação preguiçosa basta.
+    """
+    oferta = {}
+    for juiz, prioridades in enumerate(indice.prioridades):
+        for destino, prioridade in zip(indice.destinos[juiz], prioridades):
+            oferta.setdefault((indice.origens[juiz], destino), []).append((prioridade, juiz))
+    for candidatos in oferta.values():
+        candidatos.sort(reverse=True)
+
+    usados = set()
+
+    def melhor_juiz(origem, destino):
+        candidatos = oferta.get((origem, destino))
+        while candidatos and candidatos[-1][1] in usados:
+            candidatos.pop()
+        return candidatos[-1] if candidatos else None
+
+    def avaliar(ciclo):
+        peso = 0
+        for posicao, origem in enumerate(ciclo):
+            melhor = melhor_juiz(origem, ciclo[(posicao + 1) % len(ciclo)])
+            if melhor is None:
+                return None
+            peso += PESO_PRIORIDADE.get(melhor[0], 0)
+        return peso
+
+    ciclos_tribunais = _ciclos_de_tribunais(indice, max_len)
+    fila = []
+    for numero, ciclo in enumerate(ciclos_tribunais):
+        peso = avaliar(ciclo)
+        if peso is not None:
+            fila.append((-peso, len(ciclo), numero))
+    heapify(fila)
+
+    escolhidos = []
+    while fila and perf_counter() < prazo:
+        peso_anotado, tamanho, numero = heappop(fila)
+        ciclo = ciclos_tribunais[numero]
+        peso = avaliar(ciclo)
+        if peso is None:
+            continue
+        if -peso != peso_anotado:
+            heappush(fila, (-peso, tamanho, numero))
+            continue
+        juizes = tuple(melhor_juiz(origem, ciclo[(posicao + 1) % len(ciclo)])[1] for posicao, origem in enumerate(ciclo))
+        usados.update(juizes)
+        escolhidos.append(juizes)
+        peso = avaliar(ciclo)
+        if peso is not None:
+            heappush(fila, (-peso, tamanho, numero))
+    return escolhidos
+
+
+def _planejar_por_juiz(indice, max_len, modo, limite_exato, limite_ciclos, orcamento, prazo):
+    """
+    Enumera os ciclos de juízes e resolve cada componente (exato ou guloso + busca local).
+    Devolve (ciclos escolhidos, otimo), ou None se a enumeração não coube no orçamento.
+    """
+    ciclos = []
+    for ciclo in enumerar_ciclos(indice, range(2, max_len + 1), orcamento):
+        ciclos.append(ciclo)
+        if limite_ciclos is not None and len(ciclos) > limite_ciclos:
+            return None
+    if orcamento.esgotado:
+        return None
+
+    pesos = [peso_ciclo(indice, ciclo) for ciclo in ciclos]
+    componentes = sorted(_componentes(ciclos), key=len)
+    pendentes = len(ciclos)
+    escolhidos = []
+    otimo = True
+    for candidatos in componentes:
+        # Cada componente recebe uma fatia do tempo restante proporcional ao seu tamanho
+        agora = perf_counter()
+        prazo_componente = agora + (prazo - agora) * len(candidatos) / pendentes
+        pendentes -= len(candidatos)
+
+        solucao = _guloso(ciclos, pesos, candidatos)
+        if modo == "automatico":
+            solucao = _busca_local(ciclos, pesos, candidatos, solucao, prazo_componente)
+        if modo == "exato" or len(candidatos) <= limite_exato:
+            solucao, resolvido = _exato(ciclos, pesos, candidatos, solucao, prazo_componente)
+            otimo = otimo and resolvido
+        else:
+            otimo = False
+        escolhidos.extend(ciclos[c] for c in solucao)
+    return escolhidos, otimo
+
+
+def planejar_permutas(df, max_len=4, modo="automatico", limite_exato=2_000, limite_ciclos=200_000,
+                      tempo_limite=10.0, indice=None):
+    """
+    Calcula um conjunto de ciclos disjuntos (até max_len juízes) de peso máximo.
+
+    modo:
+      - "guloso": guloso sobre o grafo de tribunais (segundos com milhares de juízes)
+      - "exato": enumera todos os ciclos de juízes e resolve cada componente por
+        branch-and-bound (para instâncias pequenas)
+      - "automatico": enumera até `limite_ciclos` ciclos de juízes; se couber, aplica
+        guloso + busca local em cada componente e refina por branch-and-bound os que
+        têm até `limite_exato` ciclos; fica com o melhor entre esse plano e o guloso
+        por tribunal
+
+    Até 60% de `tempo_limite` vai para enumerar os ciclos e o restante para resolver.
+    "otimo" indica se o plano devolvido foi provado ótimo.
+    """
+    if modo not in ("guloso", "exato", "automatico"):
+        raise ValueError(f"Modo desconhecido: {modo}")
+    if indice is None:
+        indice = IndicePermutas(df)
+
+    inicio = perf_counter()
+    prazo = inicio + tempo_limite if tempo_limite is not None else float("inf")
+    escolhidos, otimo = [], False
+
+    if modo != "guloso":
+        orcamento = Orcamento(tempo_limite * 0.6 if tempo_limite is not None else None)
+        por_juiz = _planejar_por_juiz(
+            indice, max_len, modo, limite_exato, None if modo == "exato" else limite_ciclos, orcamento, prazo
+        )
+        if por_juiz is not None:
+            escolhidos, otimo = por_juiz
+
+    if modo != "exato" and not otimo:
+        guloso = _guloso_por_tribunal(indice, max_len, prazo)
+        if sum(peso_ciclo(indice, c) for c in guloso) > sum(peso_ciclo(indice, c) for c in escolhidos):
+            escolhidos = guloso
+
+    pesos = {ciclo: peso_ciclo(indice, ciclo) for ciclo in escolhidos}
+    escolhidos.sort(key=lambda c: (len(c), -pesos[c]))
+    por_tamanho = {}
+    for ciclo in escolhidos:
+        por_tamanho[len(ciclo)] = por_tamanho.get(len(ciclo), 0) + 1
+
+    return {
+        "ciclos": [montar_ciclo(indice, ciclo) for ciclo in escolhidos],
+        "juizes_movidos": sum(len(ciclo) for ciclo in escolhidos),
+        "peso": sum(pesos.values()),
+        "por_tamanho": por_tamanho,
+        "modo": modo,
+        "otimo": otimo,
+        "tempo": perf_counter() - inicio,
+    }
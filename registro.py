@@ -0,0 +1,79 @@
+"""
+Registro compilado: tudo o que o app deriva de uma versão dos dados.
+
+Montado uma única vez por impressão digital do conjunto de dados e compartilhado,
+somente para leitura, entre todas as sessões (st.cache_resource no app). As
+execuções do script e as sessões novas deixam de recalcular o índice, os e-mails
+autorizados, o índice de nomes e as estatísticas, e de copiar o DataFrame.
+"""
+import os
+
+from algoritmo import IndicePermutas, chave_regra_entrancia, normalizar_nome, regra_entrancia
+from dados import impressao_digital
+from estatisticas import calcular_estatisticas
+from instrumentacao import etapa
+
+# Versões mantidas em memória (a atual e a anterior, durante a troca)
+VERSOES_EM_MEMORIA = 2
+# Compatibilidade de entrância oferecida no app: "mesma" ou matriz JSON (ver algoritmo.regra_entrancia)
+REGRA_ENTRANCIA = regra_entrancia(os.environ.get("PERMUTA_ENTRANCIA"))
+
+
+class Registro:
+    """Dados de uma versão da planilha e as estruturas derivadas dela. Não deve ser alterado."""
+
+    def __init__(self, df):
+        self.df = df
+        self.impressao_digital = impressao_digital(df)
+        with etapa("indice", linhas_lidas=len(df)):
+            self.indice = IndicePermutas(df)
+        self.emails = frozenset(df["E-mail"].dropna().unique()) if "E-mail" in df.columns else frozenset()
+        with etapa("indice_nomes"):
+            self.nomes = self.indice.nomes_indexados()
+        # Opções do selectbox: chaves das linhas em ordem de nome; homônimos levam a origem no rótulo
+        self.opcoes = tuple(
+            self.indice.chaves[posicao]
+            for posicao in sorted(range(len(df)), key=lambda p: (self.indice.nomes[p], p))
+        )
+        homonimos = {nome for nome, posicoes in self.nomes.por_nome.items() if len(posicoes) > 1}
+        self._rotulos = {
+            chave: f"{nome} ({origem})" if normalizar_nome(nome) in homonimos else nome
+            for chave, nome, origem in zip(self.indice.chaves, self.indice.nomes, self.indice.origens_exibicao)
+        }
+        self.estatisticas = calcular_estatisticas(df)
+        self.tribunais_envolvidos = int(df["Código Origem"].nunique())
+        self.colunas_exibicao = [c for c in df.columns if not c.startswith("Código ")]
+        self._indices_entrancia = {}
+
+    def __len__(self):
+        return len(self.df)
+
+    def autorizado(self, email):
+        return email in self.emails
+
+    def indice_entrancia(self, regra):
+        """Índice particionado pela regra de entrância (o completo se regra for None), montado na primeira consulta"""
+        if regra is None:
+            return self.indice
+        chave = chave_regra_entrancia(regra)
+        if chave not in self._indices_entrancia:
+            with etapa("indice_entrancia"):
+                self._indices_entrancia[chave] = IndicePermutas(self.df, regra)
+        return self._indices_entrancia[chave]
+
+    def rotulo(self, chave):
+        """Nome exibido para a chave de um juiz ("" para a opção vazia)"""
+        return self._rotulos.get(chave, "") if chave is not None else ""
+
+
+_registros = {}
+
+
+def compilar_registro(df):
+    """Registro da versão de `df`, montado na primeira chamada e reaproveitado nas seguintes"""
+    digital = impressao_digital(df)
+    if digital not in _registros:
+        while len(_registros) >= VERSOES_EM_MEMORIA:
+            _registros.pop(next(iter(_registros)))
+        _registros[digital] = Registro(df)
+    return _registros[digital]
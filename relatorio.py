@@ -0,0 +1,200 @@
+"""
+Relatório em lote: as permutas possíveis de todos os juízes cadastrados.
+
+Roda fora do Streamlit (ex.: agendado à noite). Sem limite, faz uma única
+enumeração global dos ciclos e atribui cada ciclo a todos os seus participantes;
+com --limite, faz por juiz a busca enraizada com poda dos melhores ciclos, que
+não precisa enumerar todos. O resultado vai para o arquivo de resultados
+(resultados.py), que o app consulta sem refazer a busca. Com --tempo-limite,
+os juízes que não couberam no prazo ficam pendentes e o app os busca ao vivo.
+
+    python relatorio.py --credenciais credenciais.json --limite 200
+    python relatorio.py --arquivo planilha.csv --limite 200 --tempo-limite 600 --csv resumo.csv
+"""
+import argparse
+import os
+import subprocess
+import sys
+import threading
+from datetime import datetime, timezone
+from time import perf_counter
+
+from algoritmo import IndicePermutas, chave_canonica, custo_ciclo
+from dados import impressao_digital
+from instrumentacao import configurar_log
+from ler_planilha import ler_credenciais
+from paralelo import enumerar_ciclos_paralelo, melhores_por_juiz
+from resultados import CAMINHO_RESULTADOS, TEMPO_PRE_CALCULADO, ArquivoResultados
+from sincronizacao import CAMINHO_SNAPSHOT, FonteArquivo, SnapshotLocal, carregar_snapshot, fonte_padrao, sincronizar
+
+
+def calcular_por_juiz(indice, max_len=4, limite=None, trabalhadores=1, tempo_limite=None):
+    """
+    Ciclos de 2 a max_len juízes de cada juiz. Devolve (por_juiz, pendentes):
+    - por_juiz: {(posição do juiz, tamanho): [(custo, ciclo na forma canônica), ...]} em ordem de custo;
+    - pendentes: posições dos juízes cujo cálculo não coube em `tempo_limite` (vazio se completo).
+    Sem `limite`, uma única enumeração de todos os ciclos, repartida por participante
+    (se o prazo acabar, nenhum juiz está completo). Com `limite`, os `limite` ciclos mais
+    baratos de cada tamanho de cada juiz, pela busca enraizada com poda.
+    """
+    tamanhos = range(2, max_len + 1)
+    por_juiz = {}
+    if limite is None:
+        enumerados, completo = enumerar_ciclos_paralelo(indice, tamanhos, trabalhadores, tempo_limite)
+        for ciclo in enumerados:
+            custo = custo_ciclo(indice, ciclo)
+            for juiz in ciclo:
+                por_juiz.setdefault((juiz, len(ciclo)), []).append((custo, ciclo))
+        pendentes = set() if completo else set(range(len(indice)))
+    else:
+        melhores = melhores_por_juiz(indice, limite, tamanhos, trabalhadores, tempo_limite)
+        for juiz, por_tamanho in melhores.items():
+            for tamanho, ciclos in por_tamanho.items():
+                if ciclos:
+                    por_juiz[(juiz, tamanho)] = [(custo_ciclo(indice, c), chave_canonica(c)) for c in ciclos]
+        pendentes = set(range(len(indice))) - set(melhores)
+    return {chave: sorted(lista) for chave, lista in por_juiz.items()}, pendentes
+
+
+def gerar_relatorio(df, arquivo, max_len=4, limite=None, trabalhadores=1, indice=None, tempo_limite=None,
+                    snapshot=None):
+    """
+    Calcula os ciclos de todos os juízes e grava no ArquivoResultados `arquivo`.
+    Com `snapshot`, não grava se ele tiver mudado de versão durante o cálculo;
+    meta["gravado"] diz se o arquivo foi atualizado.
+    """
+    versao = df.attrs.get("versao")
+    if indice is None:
+        indice = IndicePermutas(df)
+    inicio = perf_counter()
+    por_juiz, pendentes = calcular_por_juiz(indice, max_len, limite, trabalhadores, tempo_limite)
+
+    # Ids na ordem lexicográfica dos ciclos canônicos (a ordem da enumeração global)
+    ids = {ciclo: id_ for id_, ciclo in enumerate(sorted({c for lista in por_juiz.values() for _, c in lista}))}
+    ciclos = []
+    for ciclo, id_ in ids.items():
+        ciclos.append((id_, len(ciclo), custo_ciclo(indice, ciclo), [indice.chaves[posicao] for posicao in ciclo]))
+    participacoes = []
+    for (juiz, tamanho), lista in por_juiz.items():
+        for custo, ciclo in lista:
+            participacoes.append((indice.chaves[juiz], tamanho, custo, ids[ciclo], ciclo.index(juiz)))
+
+    meta = {
+        "versao": versao,
+        "impressao_digital": impressao_digital(df),
+        "max_len": max_len,
+        "limite": limite,
+        "juizes": len(indice),
+        "ciclos": len(ciclos),
+        "completo": not pendentes,
+        "pendentes": len(pendentes),
+        "gerado_em": datetime.now(timezone.utc).isoformat(),
+        "duracao": perf_counter() - inicio,
+    }
+    juizes = zip(indice.chaves, indice.nomes, indice.origens_exibicao)
+    if snapshot is not None and snapshot.versao() != versao:
+        meta["gravado"] = False
+        return meta
+    pendentes = [indice.chaves[posicao] for posicao in sorted(pendentes)]
+    meta["gravado"] = arquivo.gravar(meta, juizes, sorted(ciclos), participacoes, pendentes)
+    return meta
+
+
+# Geração disparada pelo app: impressão digital dos dados e o processo que a calcula
+# Geração em andamento (ou a última): dados, processo, se falhou e tentativas com esses dados
+_geracao = {"digital": None, "processo": None, "falhou": False, "tentativas": 0}
+_trava = threading.Lock()
+MAXIMO_TENTATIVAS = 3
+
+
+def regenerar_em_segundo_plano(df, arquivo, snapshot=CAMINHO_SNAPSHOT, max_len=4, limite=None,
+                               tempo_limite=TEMPO_PRE_CALCULADO):
+    """
+    Gera o arquivo de resultados em outro processo (este mesmo script, lendo o snapshot),
+    sem travar nem disputar o processo de quem chamou (o app, após atualizar os dados).
+    Uma geração por vez e por versão dos dados (refeita, até MAXIMO_TENTATIVAS, se o
+    processo falhar): a de dados mais antigos é cancelada quando chegam dados novos.
+    Devolve True se iniciou. Enquanto ela não termina, a busca é feita ao vivo.
+    """
+    digital = impressao_digital(df)
+    with _trava:
+        processo = _geracao["processo"]
+        if processo is not None and processo.poll() is not None:
+            # Terminou: recolhido aqui, para não ficar zumbi no processo do app
+            _geracao["falhou"] = processo.returncode != 0
+            _geracao["processo"] = processo = None
+        if _geracao["digital"] == digital:
+            if processo is not None or not _geracao["falhou"] or _geracao["tentativas"] >= MAXIMO_TENTATIVAS:
+                return False
+        else:
+            _geracao["tentativas"] = 0
+        if processo is not None:
+            processo.terminate()
+            processo.wait()
+        comando = [
+            sys.executable, os.path.abspath(__file__), "--sem-sincronizar",
+            "--snapshot", os.path.abspath(snapshot), "--saida", os.path.abspath(arquivo.caminho),
+            "--max-len", str(max_len), "--impressao-digital", digital,
+        ]
+        if limite is not None:
+            comando += ["--limite", str(limite)]
+        if tempo_limite is not None:
+            comando += ["--tempo-limite", str(tempo_limite)]
+        _geracao["digital"] = digital
+        _geracao["falhou"] = False
+        _geracao["tentativas"] += 1
+        _geracao["processo"] = subprocess.Popen(comando, stdout=subprocess.DEVNULL)
+    return True
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Relatório de permutas de todos os juízes")
+    parser.add_argument("--arquivo", help="CSV local no formato da planilha (em vez do Google Sheets)")
+    parser.add_argument("--credenciais", default="credenciais.json", help="JSON da conta de serviço do Google")
+    parser.add_argument("--snapshot", default=CAMINHO_SNAPSHOT, help="cópia local da planilha")
+    parser.add_argument("--saida", default=CAMINHO_RESULTADOS, help="arquivo de resultados (SQLite)")
+    parser.add_argument("--max-len", type=int, default=4, help="maior ciclo buscado (padrão: quadrangulação)")
+    parser.add_argument("--limite", type=int, help="máximo de ciclos guardados por juiz e tamanho")
+    parser.add_argument("--tempo-limite", type=float, help="segundos para a busca; juízes não calculados ficam pendentes")
+    parser.add_argument("--trabalhadores", type=int, default=1, help="processos para a busca (0 = todas as CPUs)")
+    parser.add_argument("--csv", help="exporta também o resumo por juiz em CSV")
+    parser.add_argument("--forcar", action="store_true", help="baixa a planilha mesmo sem mudança de revisão")
+    parser.add_argument("--sem-sincronizar", action="store_true", help="usa o snapshot como está, sem ir à fonte")
+    parser.add_argument("--impressao-digital", help="só gera se o snapshot ainda tiver estes dados (uso do app)")
+    args = parser.parse_args(argumentos)
+    configurar_log()
+
+    snapshot = SnapshotLocal(args.snapshot)
+    if args.sem_sincronizar:
+        if snapshot.vazio():
+            parser.error(f"snapshot vazio: {args.snapshot}")
+        fonte = None
+    else:
+        fonte = FonteArquivo(args.arquivo) if args.arquivo else fonte_padrao(ler_credenciais(args.credenciais))
+        sincronizar(fonte, snapshot, forcar=args.forcar)
+    df = carregar_snapshot(fonte, snapshot)
+    if args.impressao_digital and impressao_digital(df) != args.impressao_digital:
+        # Não é falha: quem pediu pede de novo com os dados novos
+        print("⏭️ Os dados mudaram desde o pedido; nada a gerar")
+        return 0
+
+    arquivo = ArquivoResultados(args.saida)
+    meta = gerar_relatorio(
+        df, arquivo, args.max_len, args.limite, args.trabalhadores or None,
+        tempo_limite=args.tempo_limite, snapshot=snapshot,
+    )
+    if not meta["gravado"]:
+        print("⏭️ Os dados mudaram durante o cálculo; o arquivo não foi substituído")
+        return 1
+    print(f"✅ {meta['juizes']} juízes, {meta['ciclos']} ciclos em {meta['duracao']:.1f}s → {args.saida}")
+    if not meta["completo"]:
+        print(f"⏱️ Prazo esgotado: {meta['pendentes']} juízes pendentes (buscados ao vivo no app)")
+
+    if args.csv:
+        arquivo.resumo().to_csv(args.csv)
+        print(f"📄 Resumo por juiz em {args.csv}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""
+Arquivo de resultados pré-calculados (SQLite).
+
+A rotina em lote (relatorio.py) grava os ciclos de todos os juízes de uma vez;
+a consulta de um juiz é então uma leitura indexada, sem busca no grafo.
+Os juízes são identificados pela chave da linha (índice do DataFrame) e cada
+participação guarda em que posição do ciclo o juiz está, para que o ciclo possa
+ser exibido a partir dele. Os juízes que a rotina não calculou no prazo ficam em
+`pendentes`, e a consulta deles volta para a busca ao vivo.
+"""
+import json
+import os
+import sqlite3
+
+import pandas as pd
+
+from algoritmo import IndicePermutas, localizar_juiz
+from dados import impressao_digital
+
+CAMINHO_RESULTADOS = os.environ.get("PERMUTA_RESULTADOS", os.path.join(".dados", "resultados.sqlite"))
+# Modo pré-calculado do app (PERMUTA_PRE_CALCULADO=1) e quantos ciclos guardar por juiz e tamanho
+PRE_CALCULADO = os.environ.get("PERMUTA_PRE_CALCULADO") == "1"
+LIMITE_PRE_CALCULADO = int(os.environ.get("PERMUTA_LIMITE_PRE_CALCULADO", 500))
+# Prazo (s) da geração disparada pelo app; o que não couber fica pendente e é buscado ao vivo
+TEMPO_PRE_CALCULADO = float(os.environ.get("PERMUTA_TEMPO_PRE_CALCULADO", 600))
+NOMES_TAMANHOS = {2: "Casais", 3: "Triangulações", 4: "Quadrangulações"}
+
+
+class ArquivoResultados:
+    """Ciclos por juiz, com a versão e a impressão digital dos dados que os geraram"""
+
+    def __init__(self, caminho=CAMINHO_RESULTADOS):
+        self.caminho = caminho
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        with self._conectar() as conexao:
+            conexao.execute("CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor TEXT)")
+            conexao.execute(
+                "CREATE TABLE IF NOT EXISTS juizes (chave TEXT PRIMARY KEY, ordem INTEGER, nome TEXT, origem TEXT)"
+            )
+            conexao.execute(
+                "CREATE TABLE IF NOT EXISTS ciclos (id INTEGER PRIMARY KEY, tamanho INTEGER, custo INTEGER, juizes TEXT)"
+            )
+            conexao.execute(
+                "CREATE TABLE IF NOT EXISTS participacoes "
+                "(juiz TEXT, tamanho INTEGER, custo INTEGER, ciclo INTEGER, posicao INTEGER)"
+            )
+            conexao.execute("CREATE TABLE IF NOT EXISTS pendentes (chave TEXT PRIMARY KEY)")
+            conexao.execute(
+                "CREATE INDEX IF NOT EXISTS participacoes_juiz ON participacoes (juiz, tamanho, custo, ciclo)"
+            )
+
+    def _conectar(self):
+        return sqlite3.connect(self.caminho)
+
+    def meta(self, chave, padrao=None):
+        with self._conectar() as conexao:
+            linha = conexao.execute("SELECT valor FROM meta WHERE chave = ?", (chave,)).fetchone()
+        return json.loads(linha[0]) if linha else padrao
+
+    def metadados(self):
+        with self._conectar() as conexao:
+            return {chave: json.loads(valor) for chave, valor in conexao.execute("SELECT chave, valor FROM meta")}
+
+    def vazio(self):
+        return self.meta("impressao_digital") is None
+
+    def atualizado(self, df):
+        """O arquivo foi gerado a partir destes mesmos dados (mesma impressão digital)"""
+        return self.meta("impressao_digital") == impressao_digital(df)
+
+    def atende(self, df, tamanhos, limite=None):
+        """
+        Atualizado para `df` e capaz de responder à consulta: cobre todos os `tamanhos`
+        e guardou pelo menos `limite` ciclos por juiz (todos, se `limite` for None).
+        """
+        meta = self.metadados()
+        if meta.get("impressao_digital") != impressao_digital(df):
+            return False
+        if tamanhos and max(tamanhos) > meta.get("max_len", 0):
+            return False
+        guardados = meta.get("limite")
+        return guardados is None or (limite is not None and limite <= guardados)
+
+    def pendente(self, chave):
+        """O juiz ficou de fora da última geração (prazo esgotado)"""
+        with self._conectar() as conexao:
+            linha = conexao.execute("SELECT 1 FROM pendentes WHERE chave = ?", (json.dumps(chave),)).fetchone()
+        return linha is not None
+
+    def gravar(self, meta, juizes, ciclos, participacoes, pendentes=()):
+        """
+        Substitui todo o conteúdo em uma única transação e devolve True.
+        Não grava (devolve False) se o arquivo já tiver resultados de uma versão mais
+        nova dos dados: uma geração antiga que termine depois não apaga a nova.
+        - juizes: (chave, nome, origem) na ordem da planilha
+        - ciclos: (id, tamanho, custo, chaves dos participantes na forma canônica)
+        - participacoes: (chave do juiz, tamanho, custo, id do ciclo, posição do juiz no ciclo)
+        - pendentes: chaves dos juízes não calculados
+        """
+        with self._conectar() as conexao:
+            conexao.execute("BEGIN IMMEDIATE")
+            linha = conexao.execute("SELECT valor FROM meta WHERE chave = 'versao'").fetchone()
+            gravada = json.loads(linha[0]) if linha else None
+            versao = meta.get("versao")
+            if gravada is not None and versao is not None and gravada > versao:
+                return False
+            for tabela in ("meta", "juizes", "ciclos", "participacoes", "pendentes"):
+                conexao.execute(f"DELETE FROM {tabela}")
+            conexao.executemany(
+                "INSERT INTO juizes (chave, ordem, nome, origem) VALUES (?, ?, ?, ?)",
+                [(json.dumps(chave), ordem, nome, origem) for ordem, (chave, nome, origem) in enumerate(juizes)],
+            )
+            conexao.executemany(
+                "INSERT INTO ciclos (id, tamanho, custo, juizes) VALUES (?, ?, ?, ?)",
+                [(id_, tamanho, custo, json.dumps(chaves)) for id_, tamanho, custo, chaves in ciclos],
+            )
+            conexao.executemany(
+                "INSERT INTO participacoes (juiz, tamanho, custo, ciclo, posicao) VALUES (?, ?, ?, ?, ?)",
+                ((json.dumps(chave), tamanho, custo, ciclo, posicao)
+                 for chave, tamanho, custo, ciclo, posicao in participacoes),
+            )
+            conexao.executemany("INSERT INTO pendentes (chave) VALUES (?)", [(json.dumps(c),) for c in pendentes])
+            conexao.executemany(
+                "INSERT INTO meta (chave, valor) VALUES (?, ?)",
+                [(chave, json.dumps(valor)) for chave, valor in meta.items()],
+            )
+        return True
+
+    def ciclos_do_juiz(self, chave, tamanhos=(2, 3, 4), limite=None):
+        """
+        {tamanho: [tuplas de chaves]} com o juiz na primeira posição, do menor para o
+        maior custo (soma das prioridades); com `limite`, só os `limite` primeiros de cada tamanho.
+        """
+        resultados = {tamanho: [] for tamanho in tamanhos}
+        with self._conectar() as conexao:
+            for tamanho in tamanhos:
+                registros = conexao.execute(
+                    "SELECT c.juizes, p.posicao FROM participacoes p JOIN ciclos c ON c.id = p.ciclo "
+                    "WHERE p.juiz = ? AND p.tamanho = ? ORDER BY p.custo, p.ciclo LIMIT ?",
+                    (json.dumps(chave), tamanho, -1 if limite is None else limite),
+                ).fetchall()
+                for juizes, posicao in registros:
+                    juizes = json.loads(juizes)
+                    resultados[tamanho].append(tuple(juizes[posicao:] + juizes[:posicao]))
+        return resultados
+
+    def resumo(self):
+        """Uma linha por juiz com a quantidade de ciclos de cada tamanho"""
+        with self._conectar() as conexao:
+            juizes = pd.read_sql_query("SELECT chave, nome, origem FROM juizes ORDER BY ordem", conexao)
+            contagens = pd.read_sql_query(
+                "SELECT juiz AS chave, tamanho, COUNT(*) AS quantidade FROM participacoes GROUP BY juiz, tamanho",
+                conexao,
+            )
+        tabela = contagens.pivot(index="chave", columns="tamanho", values="quantidade")
+        tabela = tabela.reindex(columns=range(2, self.meta("max_len", 4) + 1), fill_value=0)
+        tabela.columns = [NOMES_TAMANHOS.get(tamanho, f"Ciclos de {tamanho}") for tamanho in tabela.columns]
+        resumo = juizes.join(tabela, on="chave")
+        resumo[tabela.columns] = resumo[tabela.columns].fillna(0).astype(int)
+        resumo["chave"] = resumo["chave"].map(json.loads)
+        return resumo.rename(columns={"chave": "Chave", "nome": "Nome", "origem": "Origem"}).set_index("Chave")
+
+
+def buscar_ciclos_por_nome_pre_calculados(arquivo, df, nome_juiz, tamanhos=(2, 3, 4), limite=None, indice=None):
+    """
+    Mesmo retorno de algoritmo.buscar_ciclos_por_nome, lido do arquivo de resultados.
+    Devolve None se o arquivo não estiver atualizado para `df` ou não cobrir a consulta;
+    quem chama volta então para a busca ao vivo.
+    """
+    if not arquivo.atende(df, tamanhos, limite):
+        return None
+    if indice is None:
+        indice = IndicePermutas(df)
+    resultados = {2: [], 3: [], 4: []}
+
+    raiz = localizar_juiz(df, nome_juiz, indice)
+    if raiz is None:
+        return indice, resultados
+    if arquivo.pendente(indice.chaves[raiz]):
+        return None
+
+    posicoes = {chave: posicao for posicao, chave in enumerate(indice.chaves)}
+    tamanhos = sorted(set(tamanhos) & set(resultados))
+    for tamanho, ciclos in arquivo.ciclos_do_juiz(indice.chaves[raiz], tamanhos, limite).items():
+        resultados[tamanho] = [tuple(posicoes[chave] for chave in ciclo) for ciclo in ciclos]
+    return indice, resultados
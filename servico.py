@@ -0,0 +1,401 @@
+"""
+Serviço HTTP/JSON de busca de permutas (asyncio, só biblioteca padrão).
+
+Expõe as funções de algoritmo.py para vários clientes ao mesmo tempo, em vez de
+cada sessão do Streamlit refazer a mesma busca:
+- GET  /casais?origem=TJSP&destino=TJRJ       permutas diretas entre dois tribunais
+- GET  /ciclos?juiz=<chave ou nome>&tamanhos=2,3,4&limite=50     (limite até LIMITE_MAXIMO)
+- GET  /estatisticas
+- GET  /plano?max_len=4&modo=automatico&tempo_limite=10          (até TEMPO_MAXIMO_PLANO s)
+- GET  /novidades?desde=<versão>&juiz=<chave ou nome>&limite=50   ciclos novos e desfeitos
+                                               desde a versão (só com PERMUTA_NOVIDADES=1)
+- GET  /saude                                  versão dos dados em uso
+- POST /atualizar                              sincroniza o snapshot com a fonte
+Nas buscas, entrancia=mesma (ou uma matriz JSON) restringe às entrâncias compatíveis.
+
+Os dados vêm do snapshot local (sincronizacao.py), sem rede se a fonte for um
+arquivo. Pedidos idênticos em andamento são atendidos por um único cálculo, e as
+respostas ficam em memória por versão dos dados (a impressão digital entra na chave).
+Com PERMUTA_NOVIDADES=1, um MatcherIncremental (incremental.py) recalcula, em segundo
+plano a cada versão nova, só os ciclos dos juízes que mudaram; é dele que saem as novidades.
+
+    PERMUTA_ARQUIVO_LOCAL=planilha.csv python servico.py --porta 8765
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from time import monotonic
+from urllib.error import URLError
+from urllib.parse import parse_qs, urlencode, urlsplit
+from urllib.request import Request, urlopen
+
+from algoritmo import buscar_ciclos_por_nome, buscar_permutas_diretas, montar_casal, montar_ciclo, regra_entrancia
+from dados import impressao_digital
+from incremental import MatcherIncremental
+from planejador import planejar_permutas
+from registro import compilar_registro
+from sincronizacao import CAMINHO_SNAPSHOT, SnapshotLocal, carregar_snapshot, fonte_padrao, sincronizar
+
+# Endereço do serviço para o app (vazio: o app chama a biblioteca diretamente)
+URL_SERVICO = os.environ.get("PERMUTA_SERVICO", "")
+MAXIMO_RESPOSTAS = 1024
+# De quanto em quanto tempo (s) o serviço confere se o snapshot ganhou uma versão nova
+INTERVALO_VERIFICACAO = 5.0
+TAMANHO_MAXIMO_PEDIDO = 64 * 1024
+# Resultados por tamanho em /ciclos: uma página do app por padrão, no máximo dez
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 500
+# Maior prazo (s) aceito em /plano e maior ciclo
+TEMPO_MAXIMO_PLANO = 30.0
+MAX_LEN_MAXIMO = 4
+# Novidades (/novidades): desligadas por padrão, pois guardam em memória os ciclos
+# do cadastro; prazo (s) e máximo de ciclos da enumeração inicial, prazo de cada
+# atualização e quantas versões para trás ainda são respondidas
+NOVIDADES = os.environ.get("PERMUTA_NOVIDADES") == "1"
+TEMPO_INCREMENTAL = float(os.environ.get("PERMUTA_TEMPO_INCREMENTAL", "30"))
+MAXIMO_CICLOS_INCREMENTAL = int(os.environ.get("PERMUTA_MAXIMO_CICLOS_INCREMENTAL", "200000"))
+VERSOES_NOVIDADES = int(os.environ.get("PERMUTA_VERSOES_NOVIDADES", "10"))
+
+
+class ErroPedido(Exception):
+    """Parâmetro inválido: vira uma resposta 400"""
+
+
+def _json_padrao(valor):
+    # Inteiros do NumPy/pandas e Series das estatísticas
+    if hasattr(valor, "item"):
+        return valor.item()
+    if hasattr(valor, "to_dict"):
+        return valor.to_dict()
+    if isinstance(valor, (set, frozenset, tuple)):
+        return list(valor)
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+
+def _inteiro(parametros, nome, padrao, minimo=None, maximo=None):
+    valor = parametros.get(nome, padrao)
+    try:
+        valor = int(valor) if valor is not None else None
+    except ValueError:
+        raise ErroPedido(f"'{nome}' deve ser um número inteiro")
+    if valor is not None and (minimo is not None and valor < minimo or maximo is not None and valor > maximo):
+        raise ErroPedido(f"'{nome}' deve estar entre {minimo} e {maximo}")
+    return valor
+
+
+class ServicoPermutas:
+    """Estado do serviço: registro da versão atual, cache de respostas e pedidos em andamento"""
+
+    def __init__(self, fonte, snapshot, trabalhadores=4, novidades=NOVIDADES):
+        self.fonte = fonte
+        self.snapshot = snapshot
+        self.executor = ThreadPoolExecutor(trabalhadores)
+        # Recargas fora do executor dos cálculos: /saude não espera buscas longas
+        self.recarga = ThreadPoolExecutor(1)
+        self.registro = compilar_registro(carregar_snapshot(fonte, snapshot))
+        self.versao = self.registro.df.attrs.get("versao")
+        self.trava = threading.Lock()
+        # O matcher vive na sua própria thread: montagem e atualizações não atrasam as buscas,
+        # e os pedidos de /novidades esperam na fila atrás delas
+        self.matcher = None
+        self.novidades = ThreadPoolExecutor(1) if novidades else None
+        if self.novidades is not None:
+            self.novidades.submit(self._atualizar_matcher, self.registro.df)
+        self.verificado_em = monotonic()
+        self.respostas = OrderedDict()
+        self.em_andamento = {}
+        self.estatisticas = {"pedidos": 0, "calculados": 0, "em_cache": 0, "agrupados": 0}
+
+    # ----- dados -----
+    def _recarregar_se_mudou(self, forcar=False):
+        """Troca o registro se o snapshot tiver uma versão nova (consultado no máximo a cada poucos segundos)"""
+        if not forcar and monotonic() - self.verificado_em < INTERVALO_VERIFICACAO:
+            return
+        self.verificado_em = monotonic()
+        with self.trava:
+            versao = self.snapshot.versao()
+            if versao == self.versao:
+                return
+            self.registro = compilar_registro(carregar_snapshot(self.fonte, self.snapshot))
+            self.versao = versao
+            digital = self.registro.impressao_digital
+            for chave in [chave for chave in self.respostas if chave[0] != digital]:
+                del self.respostas[chave]
+            if self.novidades is not None:
+                self.novidades.submit(self._atualizar_matcher, self.registro.df)
+
+    def _atualizar_matcher(self, df):
+        """Na thread das novidades: monta o matcher ou aplica uma versão nova"""
+        if self.matcher is None:
+            self.matcher = MatcherIncremental(df, tempo_limite=TEMPO_INCREMENTAL, maximo_ciclos=MAXIMO_CICLOS_INCREMENTAL)
+        else:
+            self.matcher.atualizar(df)
+            self.matcher.podar(self.matcher.versao - VERSOES_NOVIDADES)
+
+    # ----- operações (executadas em threads) -----
+    @staticmethod
+    def _indice(registro, parametros):
+        try:
+            return registro.indice_entrancia(regra_entrancia(parametros.get("entrancia")))
+        except ValueError as erro:
+            raise ErroPedido(str(erro))
+
+    def _casais(self, registro, parametros):
+        origem, destino = parametros.get("origem"), parametros.get("destino")
+        if not origem or not destino:
+            raise ErroPedido("Informe 'origem' e 'destino'")
+        casais = buscar_permutas_diretas(registro.df, origem, destino, self._indice(registro, parametros))
+        return {"casais": casais, "quantidade": len(casais)}
+
+    def _ciclos(self, registro, parametros):
+        juiz = parametros.get("juiz")
+        if not juiz:
+            raise ErroPedido("Informe 'juiz' (chave ou nome)")
+        try:
+            tamanhos = [int(t) for t in parametros.get("tamanhos", "2,3,4").split(",") if t]
+        except ValueError:
+            raise ErroPedido("'tamanhos' deve ser uma lista como 2,3,4")
+        if not set(tamanhos) <= {2, 3, 4}:
+            raise ErroPedido("'tamanhos' aceita só 2, 3 e 4")
+        limite = _inteiro(parametros, "limite", LIMITE_PADRAO, 1, LIMITE_MAXIMO)
+        indice = self._indice(registro, parametros)
+        posicao = indice.nomes_indexados().resolver(juiz)
+        if posicao is None:
+            return {"juiz": None, "ciclos": {str(t): [] for t in tamanhos}}
+        _, ciclos = buscar_ciclos_por_nome(registro.df, indice.chaves[posicao], tamanhos, limite, indice)
+        montar = parametros.get("montar") == "1"
+        return {
+            "juiz": indice.chaves[posicao],
+            "ciclos": {
+                str(tamanho): [
+                    (montar_casal if tamanho == 2 else montar_ciclo)(indice, ciclo) if montar
+                    else [indice.chaves[p] for p in ciclo]
+                    for ciclo in ciclos[tamanho]
+                ]
+                for tamanho in tamanhos if tamanho in ciclos
+            },
+        }
+
+    def _estatisticas(self, registro, parametros):
+        procurados, exportadores, hubs = registro.estatisticas
+        return {
+            "juizes": len(registro),
+            "tribunais": registro.tribunais_envolvidos,
+            "procurados": procurados,
+            "exportadores": list(exportadores.items()),
+            "hubs": hubs,
+        }
+
+    def _plano(self, registro, parametros):
+        modo = parametros.get("modo", "automatico")
+        if modo not in ("guloso", "exato", "automatico"):
+            raise ErroPedido("'modo' deve ser guloso, exato ou automatico")
+        try:
+            tempo_limite = float(parametros.get("tempo_limite", 10.0))
+        except ValueError:
+            raise ErroPedido("'tempo_limite' deve ser um número de segundos")
+        if not 0 < tempo_limite <= TEMPO_MAXIMO_PLANO:
+            raise ErroPedido(f"'tempo_limite' deve estar entre 0 e {TEMPO_MAXIMO_PLANO:g} segundos")
+        return planejar_permutas(
+            registro.df, _inteiro(parametros, "max_len", 4, 2, MAX_LEN_MAXIMO), modo, tempo_limite=tempo_limite,
+            indice=self._indice(registro, parametros),
+        )
+
+    def _novidades(self, registro, parametros):
+        """Na thread das novidades, depois das atualizações pendentes do matcher"""
+        desde = _inteiro(parametros, "desde", None)
+        if desde is None:
+            raise ErroPedido("Informe 'desde' (versão dos dados)")
+        limite = _inteiro(parametros, "limite", LIMITE_PADRAO, 1, LIMITE_MAXIMO)
+        matcher = self.matcher
+        if desde < matcher.versao_minima:
+            raise ErroPedido(f"'desde' deve ser a versão {matcher.versao_minima} ou posterior")
+        chave = None
+        if parametros.get("juiz"):
+            posicao = registro.indice.nomes_indexados().resolver(parametros["juiz"])
+            if posicao is None:
+                return {"juiz": None, "versao": matcher.versao, "completo": matcher.completo, "novos": [], "removidos": []}
+            chave = registro.indice.chaves[posicao]
+        return {
+            "juiz": chave,
+            "versao": matcher.versao,
+            "completo": matcher.completo,
+            "novos": matcher.novos_desde(desde, chave, limite),
+            "removidos": matcher.removidos_desde(desde, chave, limite),
+        }
+
+    ROTAS = {"/casais": "_casais", "/ciclos": "_ciclos", "/estatisticas": "_estatisticas", "/plano": "_plano"}
+
+    # ----- atendimento -----
+    async def responder(self, metodo, caminho, parametros):
+        """(status, corpo JSON em bytes) para um pedido"""
+        self.estatisticas["pedidos"] += 1
+        loop = asyncio.get_running_loop()
+
+        if caminho == "/saude":
+            # Responde com a versão em uso; a conferência do snapshot segue em segundo plano
+            self.recarga.submit(self._recarregar_se_mudou)
+            return HTTPStatus.OK, self._json({
+                "versao": self.versao, "impressao_digital": self.registro.impressao_digital,
+                "juizes": len(self.registro), **self.estatisticas,
+            })
+        if caminho == "/atualizar":
+            if metodo != "POST":
+                return HTTPStatus.METHOD_NOT_ALLOWED, self._json({"erro": "Use POST"})
+            resumo = await self._uma_vez(("atualizar",), self._atualizar)
+            return HTTPStatus.OK, resumo
+        if caminho == "/novidades":
+            if self.novidades is None:
+                return HTTPStatus.NOT_FOUND, self._json({"erro": "Novidades desligadas (PERMUTA_NOVIDADES=1)"})
+            # Sem cache de respostas: o matcher muda depois da troca do registro
+            await loop.run_in_executor(self.recarga, self._recarregar_se_mudou)
+            registro = self.registro
+            try:
+                corpo = await loop.run_in_executor(
+                    self.novidades, lambda: self._calcular(self._novidades, registro, parametros)
+                )
+            except ErroPedido as erro:
+                return HTTPStatus.BAD_REQUEST, self._json({"erro": str(erro)})
+            return HTTPStatus.OK, corpo
+        if caminho not in self.ROTAS:
+            return HTTPStatus.NOT_FOUND, self._json({"erro": f"Rota desconhecida: {caminho}"})
+
+        await loop.run_in_executor(self.recarga, self._recarregar_se_mudou)
+        registro = self.registro
+        chave = (registro.impressao_digital, caminho, tuple(sorted(parametros.items())))
+        if chave in self.respostas:
+            self.respostas.move_to_end(chave)
+            self.estatisticas["em_cache"] += 1
+            return HTTPStatus.OK, self.respostas[chave]
+
+        operacao = getattr(self, self.ROTAS[caminho])
+        try:
+            corpo = await self._uma_vez(chave, lambda: self._calcular(operacao, registro, parametros))
+        except ErroPedido as erro:
+            return HTTPStatus.BAD_REQUEST, self._json({"erro": str(erro)})
+
+        self.respostas[chave] = corpo
+        while len(self.respostas) > MAXIMO_RESPOSTAS:
+            self.respostas.popitem(last=False)
+        return HTTPStatus.OK, corpo
+
+    async def _uma_vez(self, chave, funcao):
+        """Pedidos idênticos simultâneos esperam o mesmo cálculo (executado em uma thread)"""
+        if chave in self.em_andamento:
+            self.estatisticas["agrupados"] += 1
+            return await asyncio.shield(self.em_andamento[chave])
+        tarefa = asyncio.get_running_loop().run_in_executor(self.executor, funcao)
+        self.em_andamento[chave] = tarefa
+        try:
+            return await asyncio.shield(tarefa)
+        finally:
+            del self.em_andamento[chave]
+
+    def _calcular(self, operacao, registro, parametros):
+        self.estatisticas["calculados"] += 1
+        resultado = operacao(registro, parametros)
+        resultado["impressao_digital"] = registro.impressao_digital
+        return self._json(resultado)
+
+    def _atualizar(self):
+        resumo = sincronizar(self.fonte, self.snapshot)
+        self._recarregar_se_mudou(forcar=True)
+        return self._json(resumo)
+
+    @staticmethod
+    def _json(dados):
+        return json.dumps(dados, ensure_ascii=False, default=_json_padrao).encode("utf-8")
+
+    async def atender(self, leitor, escritor):
+        """Uma conexão HTTP/1.1 simples: um pedido, uma resposta, conexão fechada"""
+        try:
+            cabecalho = await leitor.readuntil(b"\r\n\r\n")
+            linhas = cabecalho.decode("latin-1").split("\r\n")
+            metodo, alvo, _ = linhas[0].split(" ", 2)
+            tamanho = 0
+            for linha in linhas[1:]:
+                nome, _, valor = linha.partition(":")
+                if nome.strip().lower() == "content-length":
+                    tamanho = int(valor.strip() or 0)
+            if tamanho > TAMANHO_MAXIMO_PEDIDO:
+                raise ValueError("Pedido grande demais")
+            if tamanho:
+                await leitor.readexactly(tamanho)
+
+            partes = urlsplit(alvo)
+            parametros = {nome: valores[-1] for nome, valores in parse_qs(partes.query).items()}
+            status, corpo = await self.responder(metodo.upper(), partes.path, parametros)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            status, corpo = HTTPStatus.BAD_REQUEST, self._json({"erro": "Pedido HTTP inválido"})
+        except Exception as erro:
+            status, corpo = HTTPStatus.INTERNAL_SERVER_ERROR, self._json({"erro": str(erro)})
+
+        try:
+            escritor.write(
+                f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                "Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(corpo)}\r\n"
+                "Connection: close\r\n\r\n".encode("latin-1") + corpo
+            )
+            await escritor.drain()
+        except ConnectionError:
+            # O cliente desistiu antes da resposta (ex.: curl ... | head -c)
+            pass
+        finally:
+            escritor.close()
+
+
+async def servir(servico, host="127.0.0.1", porta=8765):
+    servidor = await asyncio.start_server(servico.atender, host, porta)
+    print(f"🚀 Serviço de permutas em http://{host}:{porta} ({len(servico.registro)} juízes)")
+    async with servidor:
+        await servidor.serve_forever()
+
+
+# ===============================
+# Cliente (usado pelo app quando PERMUTA_SERVICO está definido)
+# ===============================
+def buscar_ciclos_por_nome_servico(url, df, nome_juiz, tamanhos=(2, 3, 4), limite=None, indice=None, tempo_limite=10):
+    """
+    Mesmo retorno de algoritmo.buscar_ciclos_por_nome, calculado pelo serviço em `url`.
+    Devolve None se o serviço não responder, estiver com outra versão dos dados ou se
+    o limite passar do que ele aceita; quem chama volta então para a busca local.
+    """
+    if limite is None or limite > LIMITE_MAXIMO:
+        return None
+    parametros = {"juiz": nome_juiz, "tamanhos": ",".join(str(t) for t in tamanhos), "limite": limite}
+    try:
+        with urlopen(Request(f"{url.rstrip('/')}/ciclos?{urlencode(parametros)}"), timeout=tempo_limite) as resposta:
+            dados = json.load(resposta)
+    except (URLError, OSError, ValueError):
+        return None
+    if dados.get("impressao_digital") != impressao_digital(df):
+        return None
+
+    posicoes = indice.nomes_indexados()
+    resultados = {2: [], 3: [], 4: []}
+    for tamanho, ciclos in dados["ciclos"].items():
+        resultados[int(tamanho)] = [tuple(posicoes.posicao(chave) for chave in ciclo) for ciclo in ciclos]
+    return indice, resultados
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Serviço HTTP de busca de permutas")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--snapshot", default=CAMINHO_SNAPSHOT, help="cópia local da planilha")
+    parser.add_argument("--trabalhadores", type=int, default=4, help="threads para os cálculos")
+    args = parser.parse_args(argumentos)
+
+    # Sem PERMUTA_ARQUIVO_LOCAL, a fonte é a planilha do Google (só usada se o snapshot estiver vazio)
+    servico = ServicoPermutas(fonte_padrao(), SnapshotLocal(args.snapshot), args.trabalhadores)
+    asyncio.run(servir(servico, args.host, args.porta))
+
+
+if __name__ == "__main__":
+    main()
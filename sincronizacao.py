@@ -0,0 +1,228 @@
+"""
+Sincronização da planilha com uma cópia local (snapshot em SQLite).
+
+A partida a frio lê o snapshot local, sem rede. A atualização consulta a revisão
+da fonte: se não mudou, nada é baixado; se mudou, as linhas são comparadas por
+hash e só as adicionadas, alteradas e removidas são gravadas no snapshot.
+"""
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from dados import preparar_dados
+from instrumentacao import etapa
+
+NOME_PLANILHA = "Permuta - Magistratura Estadual"
+# Caminhos configuráveis por variável de ambiente
+CAMINHO_SNAPSHOT = os.environ.get("PERMUTA_SNAPSHOT", os.path.join(".dados", "snapshot.sqlite"))
+ARQUIVO_LOCAL = os.environ.get("PERMUTA_ARQUIVO_LOCAL")
+
+
+class FontePlanilhaGoogle:
+    """Planilha do Google Sheets acessada com a conta de serviço"""
+
+    def __init__(self, credenciais, nome=NOME_PLANILHA):
+        self.credenciais = credenciais
+        self.nome = nome
+        self._planilha = None
+
+    def _abrir(self):
+        if self._planilha is None:
+            import gspread
+
+            gc = gspread.service_account_from_dict(dict(self.credenciais))
+            self._planilha = gc.open(self.nome)
+        return self._planilha
+
+    def revisao(self):
+        """Data da última alteração da planilha, ou None se não for possível consultá-la"""
+        try:
+            return str(self._abrir().lastUpdateTime)
+        except Exception:
+            return None
+
+    def ler_linhas(self):
+        dados = self._abrir().sheet1.get_all_values()
+        return dados[0], dados[1:]
+
+
+class FonteArquivo:
+    """Arquivo CSV local com o mesmo cabeçalho da planilha (substituto offline)"""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+
+    def revisao(self):
+        estado = os.stat(self.caminho)
+        return f"{estado.st_mtime_ns}-{estado.st_size}"
+
+    def ler_linhas(self):
+        with open(self.caminho, newline="", encoding="utf-8-sig") as arquivo:
+            dados = list(csv.reader(arquivo))
+        return dados[0], dados[1:]
+
+
+def _chaves_linhas(colunas, linhas):
+    """
+    Identidade de cada linha: o e-mail; sem ele, o nome e a origem; sem nome, o conteúdo
+    da linha. Nunca a posição, que muda ao inserir ou apagar uma linha acima.
+    Repetições ganham sufixo.
+    """
+    posicoes = {coluna: colunas.index(coluna) for coluna in ("E-mail", "Nome", "Origem") if coluna in colunas}
+
+    def valor(linha, coluna):
+        posicao = posicoes.get(coluna)
+        return " ".join(linha[posicao].split()).lower() if posicao is not None and posicao < len(linha) else ""
+
+    vistas = {}
+    chaves = []
+    for linha in linhas:
+        base = valor(linha, "E-mail")
+        if not base and valor(linha, "Nome"):
+            base = f"{valor(linha, 'Nome')} | {valor(linha, 'Origem')}"
+        if not base:
+            base = "linha-" + _hash_linha(linha)[:12]
+        vistas[base] = vistas.get(base, 0) + 1
+        chaves.append(base if vistas[base] == 1 else f"{base}#{vistas[base]}")
+    return chaves
+
+
+def _hash_linha(linha):
+    return hashlib.sha1("\x1f".join(linha).encode("utf-8")).hexdigest()
+
+
+class SnapshotLocal:
+    """Cópia local da planilha: uma linha por juiz, com hash e ordem originais"""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        with self._conectar() as conexao:
+            conexao.execute("CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor TEXT)")
+            conexao.execute(
+                "CREATE TABLE IF NOT EXISTS linhas (chave TEXT PRIMARY KEY, hash TEXT, ordem INTEGER, valores TEXT)"
+            )
+
+    def _conectar(self):
+        return sqlite3.connect(self.caminho)
+
+    def meta(self, chave, padrao=None):
+        with self._conectar() as conexao:
+            linha = conexao.execute("SELECT valor FROM meta WHERE chave = ?", (chave,)).fetchone()
+        return json.loads(linha[0]) if linha else padrao
+
+    def vazio(self):
+        return self.meta("colunas") is None
+
+    def versao(self):
+        return self.meta("versao", 0)
+
+    def estado(self):
+        """chave -> (hash, ordem) de cada linha gravada"""
+        with self._conectar() as conexao:
+            return {chave: (hash_, ordem) for chave, hash_, ordem in conexao.execute("SELECT chave, hash, ordem FROM linhas")}
+
+    def aplicar(self, colunas, revisao, gravar, remover, reordenar):
+        """Grava as linhas novas/alteradas, remove as excluídas e corrige a ordem em uma única transação"""
+        versao = self.versao() + (1 if gravar or remover or reordenar or self.vazio() else 0)
+        with self._conectar() as conexao:
+            conexao.executemany("DELETE FROM linhas WHERE chave = ?", [(chave,) for chave in remover])
+            conexao.executemany("UPDATE linhas SET ordem = ? WHERE chave = ?", [(o, c) for c, o in reordenar.items()])
+            conexao.executemany(
+                "INSERT OR REPLACE INTO linhas (chave, hash, ordem, valores) VALUES (?, ?, ?, ?)",
+                [(chave, hash_, ordem, json.dumps(linha)) for chave, hash_, ordem, linha in gravar],
+            )
+            conexao.executemany(
+                "INSERT OR REPLACE INTO meta (chave, valor) VALUES (?, ?)",
+                [
+                    ("colunas", json.dumps(colunas)),
+                    ("revisao", json.dumps(revisao)),
+                    ("versao", json.dumps(versao)),
+                    ("sincronizado_em", json.dumps(datetime.now(timezone.utc).isoformat())),
+                ],
+            )
+        return versao
+
+    def carregar(self):
+        """
+        DataFrame no formato de get_all_values (tudo texto), na ordem da planilha.
+        O índice é a chave de cada juiz, estável entre versões.
+        """
+        colunas = self.meta("colunas", [])
+        with self._conectar() as conexao:
+            registros = conexao.execute("SELECT chave, valores FROM linhas ORDER BY ordem").fetchall()
+        indice = pd.Index([chave for chave, _ in registros], name="Chave")
+        return pd.DataFrame([json.loads(v) for _, v in registros], columns=colunas, index=indice)
+
+
+def sincronizar(fonte, snapshot, forcar=False):
+    """
+    Atualiza o snapshot a partir da fonte e devolve o resumo da alteração:
+    {"versao", "baixou", "adicionadas", "alteradas", "removidas"} (chaves das linhas).
+    Sem mudança de revisão (e sem `forcar`), nada é baixado.
+    """
+    revisao = fonte.revisao()
+    resumo = {"versao": snapshot.versao(), "baixou": False, "adicionadas": [], "alteradas": [], "removidas": []}
+    if not forcar and revisao is not None and not snapshot.vazio() and revisao == snapshot.meta("revisao"):
+        return resumo
+
+    with etapa("download") as medida:
+        colunas, linhas = fonte.ler_linhas()
+        medida["contadores"]["linhas_lidas"] = len(linhas)
+    linhas = [list(linha) + [""] * (len(colunas) - len(linha)) for linha in linhas]
+    mesmo_cabecalho = colunas == snapshot.meta("colunas")
+    anteriores = snapshot.estado() if mesmo_cabecalho else {}
+
+    gravar = []
+    reordenar = {}
+    vistas = set()
+    for ordem, (chave, linha) in enumerate(zip(_chaves_linhas(colunas, linhas), linhas)):
+        hash_ = _hash_linha(linha)
+        vistas.add(chave)
+        if chave not in anteriores:
+            resumo["adicionadas"].append(chave)
+        elif anteriores[chave][0] != hash_:
+            resumo["alteradas"].append(chave)
+        else:
+            if anteriores[chave][1] != ordem:
+                reordenar[chave] = ordem
+            continue
+        gravar.append((chave, hash_, ordem, linha))
+
+    if mesmo_cabecalho:
+        resumo["removidas"] = [chave for chave in anteriores if chave not in vistas]
+    else:
+        # Cabeçalho novo: o snapshot é regravado do zero
+        resumo["removidas"] = [chave for chave in snapshot.estado() if chave not in vistas]
+
+    resumo["versao"] = snapshot.aplicar(colunas, revisao, gravar, resumo["removidas"], reordenar)
+    resumo["baixou"] = True
+    return resumo
+
+
+def fonte_padrao(credenciais=None):
+    """CSV local se PERMUTA_ARQUIVO_LOCAL estiver definido; senão, a planilha do Google"""
+    if ARQUIVO_LOCAL:
+        return FonteArquivo(ARQUIVO_LOCAL)
+    return FontePlanilhaGoogle(credenciais)
+
+
+def carregar_snapshot(fonte, snapshot):
+    """
+    Lê o snapshot local, já limpo e codificado; só vai à fonte se ele ainda estiver vazio.
+    A versão do snapshot fica em df.attrs["versao"].
+    """
+    if snapshot.vazio():
+        sincronizar(fonte, snapshot)
+    with etapa("carregar_snapshot") as medida:
+        df = preparar_dados(snapshot.carregar())
+        medida["contadores"]["linhas_lidas"] = len(df)
+    df.attrs["versao"] = snapshot.versao()
+    return df
@@ -0,0 +1,114 @@
+"""
+Gerador de cadastros sintéticos, reprodutíveis pela semente, para medir e conferir
+a busca sem depender da planilha real.
+
+Os 27 tribunais são os de mapa.coordenadas_tj. A distribuição imita a real:
+- origens concentradas nos tribunais maiores;
+- destinos concentrados em poucos tribunais muito procurados (lei de Zipf);
+- parte dos juízes não preenche o 2º ou o 3º destino;
+- grafias variadas ("TJ-SP", "tjsp ") para exercitar a normalização.
+
+    python sintetico.py 5000 --semente 1 --saida cadastro.csv
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from mapa import coordenadas_tj
+
+TRIBUNAIS = list(coordenadas_tj)
+# Mais juízes lotados primeiro (ordem aproximada do tamanho dos tribunais)
+POR_TAMANHO = [
+    "TJSP", "TJMG", "TJRJ", "TJRS", "TJPR", "TJBA", "TJSC", "TJGO", "TJPE", "TJCE", "TJMA", "TJPA", "TJMT",
+    "TJDFT", "TJES", "TJMS", "TJPB", "TJRN", "TJPI", "TJAM", "TJAL", "TJSE", "TJRO", "TJTO", "TJAC", "TJAP", "TJRR",
+]
+# Destinos mais procurados primeiro
+POR_PROCURA = [
+    "TJSP", "TJDFT", "TJSC", "TJPR", "TJRJ", "TJRS", "TJMG", "TJGO", "TJES", "TJPE", "TJBA", "TJCE", "TJPB",
+    "TJRN", "TJMS", "TJMT", "TJSE", "TJAL", "TJPI", "TJMA", "TJPA", "TJTO", "TJAM", "TJRO", "TJAC", "TJAP", "TJRR",
+]
+ENTRANCIAS = ["Inicial", "Intermediária", "Final"]
+
+PRENOMES = [
+    "Ana", "Maria", "José", "João", "Paulo", "Carlos", "Fernanda", "Juliana", "Ricardo", "Marcos", "Patrícia",
+    "Luiz", "Camila", "Rafael", "Beatriz", "Eduardo", "Cláudia", "André", "Renata", "Gustavo", "Luciana",
+    "Felipe", "Aline", "Rodrigo", "Débora", "Márcio", "Helena", "Sérgio", "Tatiana", "Vinícius",
+]
+SOBRENOMES = [
+    "Silva", "Santos", "Oliveira", "Souza", "Lima", "Pereira", "Costa", "Rodrigues", "Almeida", "Nascimento",
+    "Araújo", "Ferreira", "Carvalho", "Gomes", "Martins", "Rocha", "Ribeiro", "Alves", "Monteiro", "Mendes",
+    "Barros", "Freitas", "Barbosa", "Pinto", "Moura", "Cavalcanti", "Dias", "Castro", "Campos", "Cardoso",
+]
+
+
+def _pesos_zipf(ordem, concentracao):
+    pesos = 1.0 / np.arange(1, len(ordem) + 1) ** concentracao
+    por_tribunal = dict(zip(ordem, pesos))
+    pesos = np.array([por_tribunal[tribunal] for tribunal in TRIBUNAIS])
+    return pesos / pesos.sum()
+
+
+def _variar_grafia(tribunal, sorteio):
+    if sorteio < 0.85:
+        return tribunal
+    if sorteio < 0.90:
+        return f"{tribunal[:2]}-{tribunal[2:]}"
+    if sorteio < 0.95:
+        return tribunal.lower() + " "
+    return " " + tribunal.title()
+
+
+def gerar_cadastro(n, semente=0, concentracao=1.0, sem_segundo=0.2, sem_terceiro=0.35, variar_grafia=True):
+    """
+    DataFrame no formato bruto da planilha (texto, "" quando vazio), com n juízes.
+    `concentracao` é o expoente de Zipf da procura por destino (0 = uniforme).
+    """
+    rng = np.random.default_rng(semente)
+    origens = rng.choice(len(TRIBUNAIS), size=n, p=_pesos_zipf(POR_TAMANHO, concentracao / 2))
+
+    # Três destinos distintos por juiz, sem a própria origem, sorteados com peso de procura
+    # (truque de Gumbel: os 3 maiores log(peso) + ruído são uma amostra sem reposição)
+    chaves = np.log(_pesos_zipf(POR_PROCURA, concentracao)) + rng.gumbel(size=(n, len(TRIBUNAIS)))
+    chaves[np.arange(n), origens] = -np.inf
+    destinos = np.argsort(-chaves, axis=1)[:, :3]
+
+    vazio_2 = rng.random(n) < sem_segundo
+    vazio_3 = vazio_2 | (rng.random(n) < sem_terceiro)
+    grafias = rng.random((n, 4)) if variar_grafia else np.zeros((n, 4))
+
+    def escrever(codigo, sorteio):
+        return _variar_grafia(TRIBUNAIS[codigo], sorteio)
+
+    prenomes = rng.integers(len(PRENOMES), size=n)
+    sobrenomes = rng.integers(len(SOBRENOMES), size=(n, 2))
+    entrancias = rng.integers(len(ENTRANCIAS), size=n)
+
+    linhas = []
+    for i in range(n):
+        linhas.append({
+            "Nome": f"{PRENOMES[prenomes[i]]} {SOBRENOMES[sobrenomes[i, 0]]} {SOBRENOMES[sobrenomes[i, 1]]}",
+            "E-mail": f"juiz{i:05d}@sintetico.jus.br",
+            "Entrância": ENTRANCIAS[entrancias[i]],
+            "Origem": escrever(origens[i], grafias[i, 0]),
+            "Destino 1": escrever(destinos[i, 0], grafias[i, 1]),
+            "Destino 2": "" if vazio_2[i] else escrever(destinos[i, 1], grafias[i, 2]),
+            "Destino 3": "" if vazio_3[i] else escrever(destinos[i, 2], grafias[i, 3]),
+        })
+    return pd.DataFrame(linhas)
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Gera um cadastro sintético de juízes em CSV")
+    parser.add_argument("n", type=int, help="quantidade de juízes (ex.: 100 a 50000)")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--concentracao", type=float, default=1.0, help="expoente de Zipf da procura por destino")
+    parser.add_argument("--saida", default="cadastro_sintetico.csv")
+    args = parser.parse_args(argumentos)
+
+    gerar_cadastro(args.n, args.semente, args.concentracao).to_csv(args.saida, index=False)
+    print(f"✅ {args.n} juízes em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()